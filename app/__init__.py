@@ -2,8 +2,13 @@ from fastapi import FastAPI
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
+from utils.templating import build_environment
+import os
 
 load_dotenv()
 
+# 正式環境關閉自動重新載入，取用模板時不再檢查檔案修改時間；開發時可設為 true
+TEMPLATE_AUTO_RELOAD = os.getenv("TEMPLATE_AUTO_RELOAD", "false").lower() in ("1", "true", "yes")
+
 app = FastAPI(debug=True)
-templates = Jinja2Templates(directory="templates")
\ No newline at end of file
+templates = Jinja2Templates(env=build_environment("templates", TEMPLATE_AUTO_RELOAD, os.getenv("TEMPLATE_CACHE_DIR")))
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends
+from database.db import engine
+from database.pool import pool_status
+from utils.auth import get_internal_user
+from utils.user_cache import CachedUser, user_cache
+from utils.hashing import hashing_executor
+from utils.fragment_cache import fragment_cache
+from utils.compression import compressed_cache
+from utils.broker import broker
+from utils.log import log_stats
+import os
+
+internal = APIRouter()
+
+# 所有端點只開放給 INTERNAL_ALLOWED_EMAILS 內的使用者
+
+# 連線池統計，數值為單一 worker 行程內的狀態
+@internal.get("/pool")
+async def pool(current_user: CachedUser = Depends(get_internal_user)):
+    return {"pid": os.getpid(), **pool_status(engine)}
+
+# 使用者快取命中率
+@internal.get("/user-cache")
+async def user_cache_stats(current_user: CachedUser = Depends(get_internal_user)):
+    return {"pid": os.getpid(), **user_cache.stats()}
+
+# 密碼雜湊執行緒池的排隊與耗時
+@internal.get("/hashing")
+async def hashing_stats(current_user: CachedUser = Depends(get_internal_user)):
+    return {"pid": os.getpid(), **hashing_executor.stats()}
+
+# 看板片段快取與壓縮結果快取的命中率與記憶體用量
+@internal.get("/fragment-cache")
+async def fragment_cache_stats(current_user: CachedUser = Depends(get_internal_user)):
+    return {"pid": os.getpid(), **fragment_cache.stats(), "compressed": compressed_cache.stats()}
+
+# 看板事件的訂閱者數量與發布數
+@internal.get("/broker")
+async def broker_stats(current_user: CachedUser = Depends(get_internal_user)):
+    return {"pid": os.getpid(), **broker.stats()}
+
+# 日誌佇列的積壓與丟棄數
+@internal.get("/logging")
+async def logging_stats(current_user: CachedUser = Depends(get_internal_user)):
+    return {"pid": os.getpid(), **log_stats()}
@@ -1,92 +1,170 @@
-from fastapi import APIRouter, Depends, Request, Form, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, Request, Form, HTTPException, status, Query
 from app import templates
-from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy.orm import Session, selectinload
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, Response, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from utils.get_db import get_db
 from models.lane import Lane
-from models.user import User
+from utils.user_cache import CachedUser
 from models.project import Project
 from models.task import Task
+from models.user_project import UserProject
 from typing import Annotated, Optional
 from schemas.lane import LaneCreate, LaneUpdate
 from utils.auth import get_current_active_user
-from sqlalchemy import func
+from utils.board import board_etag, board_snapshot, bump_all_board_versions, bump_board_version, get_board_version, is_not_modified, load_board, load_lane, publish_board_event, board_event_stream, render_board, render_lane
+from utils.counters import lane_task_count, reconcile_counters
+from utils.position import POSITION_GAP, move_to_index, next_position, rebalance_all
+from utils.pagination import PAGE_SIZE, keyset_page, page_size
+from utils.integrity import is_unique_violation
+import logging
 
 lane = APIRouter()
+logger = logging.getLogger(__name__)
 
 # 初始化所有泳道的位置值
+# repair=true 時保留目前的順序，只補上缺少的位置值並重新拉開間距（泳道與任務皆會處理）
 @lane.get("/initialize-positions")
-async def initialize_positions(request: Request, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    projects = db.query(Project).all()
-    for project in projects:
-        lanes = db.query(Lane).filter(Lane.project_id == project.id).order_by(Lane.id).all()
-        for i, lane in enumerate(lanes, start=1):
-            lane.position = i
+async def initialize_positions(request: Request, repair: bool = Query(False), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    if repair:
+        await rebalance_all(db, Lane, Lane.project_id)
+        await rebalance_all(db, Task, Task.lane_id)
+        await bump_all_board_versions(db)
+        await db.commit()
+        message = "所有泳道與任務位置已修復成功。"
+    else:
+        projects = (await db.scalars(select(Project))).all()
+        for project in projects:
+            lanes = (await db.scalars(select(Lane).where(Lane.project_id == project.id).order_by(Lane.id))).all()
+            for i, lane in enumerate(lanes, start=1):
+                lane.position = i * POSITION_GAP
+                db.add(lane)
+        no_project_lanes = (await db.scalars(select(Lane).where(Lane.project_id == None).order_by(Lane.id))).all()
+        for i, lane in enumerate(no_project_lanes, start=1):
+            lane.position = i * POSITION_GAP
             db.add(lane)
-    no_project_lanes = db.query(Lane).filter(Lane.project_id == None).order_by(Lane.id).all()
-    for i, lane in enumerate(no_project_lanes, start=1):
-        lane.position = i
-        db.add(lane)
-    db.commit()
+        await bump_all_board_versions(db)
+        await db.commit()
+        message = "所有泳道位置已初始化成功。"
     
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
         message_data = {
-            "message": "所有泳道位置已初始化成功。",
+            "message": message,
             "type": "success",
         }
         return HTMLResponse(content=f"""<div id="message-data" style="display:none;" data-message="{message_data['message']}" data-type="{message_data['type']}"></div>""")
-    return {"message": "所有泳道位置已初始化成功。"}
+    return {"message": message}
+
+@lane.patch("/{lane_id}/position")
+async def update_position(lane_id: int, request: Request, background_tasks: BackgroundTasks, new_index: Annotated[int, Form()], project_id: Annotated[Optional[str], Form()] = None, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    lane_obj = await db.scalar(select(Lane).where(Lane.id == lane_id))
+    if not lane_obj:
+        raise HTTPException(status_code=404, detail="查無泳道。")
+    # 看板上沒有專案時前端會送出空字串
+    if project_id and int(project_id) != lane_obj.project_id:
+        raise HTTPException(status_code=400, detail="泳道不屬於此專案。")
+    try:
+        # 取前後泳道的中間值作為新排序值，只更新被移動的泳道
+        position = await move_to_index(db, lane_obj, Lane.project_id, lane_obj.project_id, new_index, background_tasks)
+        await bump_board_version(db, lane_obj.project_id)
+        await db.commit()
+        await publish_board_event(request, lane_obj.project_id, "lane.moved", lane_id=lane_id, index=new_index)
+        return {"success": True, "position": position}
+    except Exception as e:
+        await db.rollback()
+        logger.exception("更新泳道位置時出錯")
+        raise HTTPException(status_code=500, detail=f"更新泳道位置失敗: {str(e)}")
+
+# 看板快照，以單一查詢載入泳道與任務並支援 If-None-Match
+@lane.get("/snapshot")
+async def snapshot(request: Request, project_id: int = Query(...), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    version = await get_board_version(db, project_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="查無專案。")
+    etag = board_etag(project_id, version, "json")
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if is_not_modified(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    project = await load_board(db, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="查無專案。")
+    return JSONResponse(content=board_snapshot(project), headers=headers)
+
+# 看板即時更新（Server-Sent Events），推送泳道與任務的變更事件
+@lane.get("/events")
+async def events(request: Request, project_id: int = Query(...), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    # 只有專案成員可以訂閱，非成員與不存在的專案同樣回傳 404
+    if not await db.scalar(select(UserProject.project_id).where(UserProject.user_id == current_user.id, UserProject.project_id == project_id)):
+        raise HTTPException(status_code=404, detail="查無專案。")
+    # 串流期間不會再查詢資料庫，先歸還連線，避免每個訂閱者各佔一條連線
+    await db.close()
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(board_event_stream(project_id), media_type="text/event-stream", headers=headers)
 
 @lane.get("/")
-async def index(request: Request, project_id: Optional[int] = Query(None), current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def index(request: Request, project_id: Optional[int] = Query(None), cursor: Optional[str] = Query(None), limit: int = Query(PAGE_SIZE, ge=1), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     if project_id:
-        lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).filter(Lane.project_id == project_id).order_by(Lane.position).all()
-        project = db.query(Project).filter(Project.id == project_id).first()
-        if not project:
+        # 先以主鍵取得看板版本，內容未變更時直接回傳 304
+        version = await get_board_version(db, project_id)
+        if version is None:
             raise HTTPException(status_code=404, detail="查無專案。")
         is_htmx = request.headers.get("HX-Request") == "true"
+        # 完整頁面含有使用者名稱，ETag 需依使用者區分
+        etag = board_etag(project_id, version, "partial" if is_htmx else f"user{current_user.id}")
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "HX-Request, Cookie"}
+        if is_not_modified(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        content = await render_board(request, db, project_id, version)
+        if content is None:
+            raise HTTPException(status_code=404, detail="查無專案。")
         if is_htmx:
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "project": project, "current_user": current_user})
-            return HTMLResponse(content=content)
+            return HTMLResponse(content=content, headers=headers)
         else:
-            return templates.TemplateResponse("lanes/index.html", {"request": request, "lanes": lanes, "project": project, "current_user": current_user})
+            return templates.TemplateResponse("lanes/index.html", {"request": request, "board_html": content, "current_user": current_user}, headers=headers)
     else:
-        lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).order_by(Lane.position).all()
+        # 全部泳道以 id 分頁，每頁筆數有上限
+        limit = page_size(limit)
+        lanes, next_cursor = await keyset_page(db, select(Lane).options(selectinload(Lane.project)), (Lane.id,), cursor, limit)
         is_htmx = request.headers.get("HX-Request") == "true"
         if is_htmx:
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "current_user": current_user})
+            # 「載入更多」只回傳下一頁的泳道
+            template = "lanes/partials/lanes_page.html" if cursor else "lanes/partials/lanes_list.html"
+            content = templates.get_template(template).render({"request": request, "lanes": lanes, "next_cursor": next_cursor, "limit": limit, "current_user": current_user})
             return HTMLResponse(content=content)
         else:
-            return templates.TemplateResponse("lanes/index.html", {"request": request, "lanes": lanes, "current_user": current_user})
+            return templates.TemplateResponse("lanes/index.html", {"request": request, "lanes": lanes, "next_cursor": next_cursor, "limit": limit, "current_user": current_user})
 
 @lane.post("/")
-async def create(request: Request, name: Annotated[str, Form()], project_id: Annotated[Optional[int], Form()] = None, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def create(request: Request, name: Annotated[str, Form()], project_id: Annotated[Optional[int], Form()] = None, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     create_data = LaneCreate(name=name, project_id=project_id)
     if project_id:
-        lanes = db.query(Lane).filter(Lane.name == create_data.name, Lane.project_id == project_id).first()
-        if lanes:
-            if request.headers.get("HX-Request") == "true":
-                return HTMLResponse(content=f"""<div id="error-message" class="bg-red-100 border border-red-400 text-red-700 px-4 py-3 rounded mb-4">該專案中已存在此泳道名稱</div>""",status_code=400)
-            else:
-                raise HTTPException(status_code=400, detail="該專案中已存在此泳道名稱。")
-        project = db.query(Project).filter(Project.id == project_id).first()
+        project = await db.scalar(select(Project).where(Project.id == project_id))
         if not project:
             raise HTTPException(status_code=404, detail="查無專案。")
-    if project_id:
-        max_position = db.query(func.max(Lane.position)).filter(Lane.project_id == project_id).scalar() or 0
-    else:
-        max_position = db.query(func.max(Lane.position)).scalar() or 0
-    new_lanes = Lane(name=create_data.name, project_id=project_id, position=max_position + 1)
+    position = await next_position(db, Lane, Lane.project_id, project_id)
+    new_lanes = Lane(name=create_data.name, project_id=project_id, position=position)
     db.add(new_lanes)
-    db.commit()
-    db.refresh(new_lanes)
+    await bump_board_version(db, project_id)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        # 同一專案內的泳道名稱由唯一約束保證，不需事先查詢
+        if not is_unique_violation(e, "uq_lanes_project_id_name"):
+            raise
+        if request.headers.get("HX-Request") == "true":
+            return HTMLResponse(content=f"""<div id="error-message" class="bg-red-100 border border-red-400 text-red-700 px-4 py-3 rounded mb-4">該專案中已存在此泳道名稱</div>""",status_code=400)
+        else:
+            raise HTTPException(status_code=400, detail="該專案中已存在此泳道名稱。")
+    await db.refresh(new_lanes)
+    await publish_board_event(request, project_id, "lane.created", lane_id=new_lanes.id)
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
         if project_id:
-            lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).filter(Lane.project_id == project_id).order_by(Lane.position).all()
-            project = db.query(Project).filter(Project.id == project_id).first()
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "project": project, "current_user": current_user})
+            content = await render_board(request, db, project_id)
             message_data = {
                 "message": f"泳道 {name} 建立成功。",
                 "type": "success",
@@ -94,8 +172,8 @@ async def create(request: Request, name: Annotated[str, Form()], project_id: Ann
             content_message = f"""<div id="message-data" style="display:none;" data-message="{message_data['message']}" data-type="{message_data['type']}"></div>{content}"""
             return HTMLResponse(content=content_message)
         else:
-            lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).order_by(Lane.position).all()
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "current_user": current_user})
+            lanes, next_cursor = await keyset_page(db, select(Lane).options(selectinload(Lane.project)), (Lane.id,))
+            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "next_cursor": next_cursor, "limit": PAGE_SIZE, "current_user": current_user})
             message_data = {
                 "message": f"泳道 {name} 建立成功。",
                 "type": "success",
@@ -108,11 +186,11 @@ async def create(request: Request, name: Annotated[str, Form()], project_id: Ann
         return RedirectResponse(url="/lanes", status_code=status.HTTP_302_FOUND)
 
 @lane.get("/new")
-async def new(request: Request, project_id: Optional[int] = Query(None), current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    projects = db.query(Project).all()
+async def new(request: Request, project_id: Optional[int] = Query(None), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    projects = (await db.scalars(select(Project))).all()
     project = None
     if project_id:
-        project = db.query(Project).filter(Project.id == project_id).first()
+        project = await db.scalar(select(Project).where(Project.id == project_id))
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
         content = templates.get_template("lanes/partials/lanes_form.html").render({"request": request, "projects": projects, "project": project, "current_user": current_user})
@@ -121,14 +199,20 @@ async def new(request: Request, project_id: Optional[int] = Query(None), current
         return templates.TemplateResponse("lanes/new.html", {"request": request, "projects": projects, "project": project, "current_user": current_user})
 
 @lane.post("/{lane_id}/update")
-async def update(lane_id: int, name: Annotated[str, Form()], request: Request, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def update(lane_id: int, name: Annotated[str, Form()], request: Request, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     update_data = LaneUpdate(name=name)
-    lane = db.query(Lane).filter(Lane.id == lane_id).first()
+    lane = await db.scalar(select(Lane).where(Lane.id == lane_id))
     if not lane:
         raise HTTPException(status_code=404, detail="查無泳道。")
     project_id = lane.project_id
-    existing_lane = db.query(Lane).filter(Lane.name == update_data.name, Lane.id != lane.id, Lane.project_id == project_id).first()
-    if existing_lane:
+    lane.name = update_data.name
+    await bump_board_version(db, project_id)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if not is_unique_violation(e, "uq_lanes_project_id_name"):
+            raise
         if request.headers.get("HX-Request") == "true":
             error_content = f"""<div id="error-message" class="bg-red-100 border border-red-400 text-red-700 px-4 py-3 rounded mb-4">已有同名泳道</div>"""
             message_data = {
@@ -139,17 +223,20 @@ async def update(lane_id: int, name: Annotated[str, Form()], request: Request, c
             return HTMLResponse(content=content_message, status_code=400)
         else:
             raise HTTPException(status_code=400, detail="該專案中已有相同名稱的泳道。")
-    lane.name = update_data.name
-    db.commit()
+    await publish_board_event(request, project_id, "lane.updated", lane_id=lane_id)
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
+        if request.headers.get("HX-Target") == f"lane-{lane_id}":
+            # 看板上的行內編輯只替換該泳道
+            lane = await load_lane(db, lane_id)
+            lane_html = render_lane(request, lane, lane.project, await lane_task_count(db, lane))
+            message_html = templates.get_template("common/message_oob.html").render({"message": f"泳道 {name} 更新成功。", "type": "success"})
+            return HTMLResponse(content=f"{lane_html}{message_html}")
         if project_id:
-            lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).filter(Lane.project_id == project_id).order_by(Lane.position).all()
-            project = db.query(Project).filter(Project.id == project_id).first()
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "project": project, "current_user": current_user})
+            content = await render_board(request, db, project_id)
         else:
-            lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).order_by(Lane.position).all()
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "current_user": current_user})
+            lanes, next_cursor = await keyset_page(db, select(Lane).options(selectinload(Lane.project)), (Lane.id,))
+            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "next_cursor": next_cursor, "limit": PAGE_SIZE, "current_user": current_user})
         message_data = {
             "message": f"泳道 {name} 更新成功。",
             "type": "success",
@@ -161,12 +248,19 @@ async def update(lane_id: int, name: Annotated[str, Form()], request: Request, c
             return RedirectResponse(url=f"/lanes?project_id={project_id}", status_code=status.HTTP_302_FOUND)    
         return RedirectResponse(url="/lanes", status_code=status.HTTP_302_FOUND)
 
+@lane.get("/{lane_id}/fragment")
+async def fragment(request: Request, lane_id: int, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    lane = await load_lane(db, lane_id)
+    if not lane:
+        raise HTTPException(status_code=404, detail="查無泳道。")
+    return HTMLResponse(content=render_lane(request, lane, lane.project, await lane_task_count(db, lane)))
+
 @lane.get("/{lane_id}")
-async def show(request: Request, lane_id: int, project_id: Optional[int] = Query(None), current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    query = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).filter(Lane.id == lane_id)
+async def show(request: Request, lane_id: int, project_id: Optional[int] = Query(None), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    query = select(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).where(Lane.id == lane_id)
     if project_id:
-        query = query.filter(Lane.project_id == project_id)
-    lane = query.first()
+        query = query.where(Lane.project_id == project_id)
+    lane = await db.scalar(query)
     if not lane:
         raise HTTPException(status_code=404, detail="查無泳道。")
     is_htmx = request.headers.get("HX-Request") == "true"
@@ -177,36 +271,42 @@ async def show(request: Request, lane_id: int, project_id: Optional[int] = Query
         return templates.TemplateResponse("lanes/show.html", {"request": request, "lanes": lane, "current_user": current_user})
 
 @lane.get("/{lane_id}/edit")
-async def edit(request: Request, lane_id: int, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    lane = db.query(Lane).filter(Lane.id == lane_id).first()
+async def edit(request: Request, lane_id: int, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    lane = await db.scalar(select(Lane).where(Lane.id == lane_id))
     if not lane:
         raise HTTPException(status_code=404, detail="查無泳道。")
-    projects = db.query(Project).all()
+    projects = (await db.scalars(select(Project))).all()
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
+        if request.headers.get("HX-Target") == f"lane-header-{lane_id}":
+            content = templates.get_template("lanes/partials/lane_header_edit.html").render({"request": request, "lanes": lane})
+            return HTMLResponse(content=content)
         content = templates.get_template("lanes/partials/lanes_edit.html").render({"request": request, "lanes": lane, "projects": projects, "current_user": current_user})
         return HTMLResponse(content=content)
     else:
         return templates.TemplateResponse("lanes/edit.html", {"request": request, "lanes": lane, "projects": projects, "current_user": current_user})
 
 @lane.post("/{lane_id}/delete")
-async def delete(lane_id: int, request: Request, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    lane = db.query(Lane).options(selectinload(Lane.project)).filter(Lane.id == lane_id).first()
+async def delete(lane_id: int, request: Request, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    lane = await db.scalar(select(Lane).options(selectinload(Lane.project)).where(Lane.id == lane_id))
     if not lane:
         raise HTTPException(status_code=404, detail="查無泳道。")    
     project_id = lane.project_id
     lane_name = lane.name
-    db.delete(lane)
-    db.commit()
+    await db.delete(lane)
+    await bump_board_version(db, project_id)
+    # 泳道內的任務會一併脫離專案，直接重新計算該專案的計數；Session 未開啟自動 flush，先送出刪除
+    await db.flush()
+    await reconcile_counters(db, [project_id] if project_id else [])
+    await db.commit()
+    await publish_board_event(request, project_id, "lane.deleted", lane_id=lane_id)
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
         if project_id:
-            lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).filter(Lane.project_id == project_id).order_by(Lane.position).all()
-            project = db.query(Project).filter(Project.id == project_id).first()
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "project": project, "current_user": current_user})
+            content = await render_board(request, db, project_id)
         else:
-            lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).order_by(Lane.position).all()
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "current_user": current_user})
+            lanes, next_cursor = await keyset_page(db, select(Lane).options(selectinload(Lane.project)), (Lane.id,))
+            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "next_cursor": next_cursor, "limit": PAGE_SIZE, "current_user": current_user})
         message_data = {
             "message": f"泳道 {lane_name} 刪除成功。",
             "type": "success",
@@ -1,22 +1,45 @@
-from fastapi import APIRouter, Depends, Request, Form, HTTPException, status
-from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request, Form, HTTPException, status, File, Query, UploadFile
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from sqlalchemy import delete as sql_delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from utils.get_db import get_db
 from models.project import Project
 from models.lane import Lane
-from models.user import User
+from utils.user_cache import CachedUser
 from models.user_project import UserProject
-from typing import Annotated, Optional
+from typing import Annotated, Literal, Optional
 from schemas.project import ProjectCreate, ProjectUpdate
 from utils.auth import get_current_active_user
 from app import templates
 from utils.flash import get_flash_message
+from utils.board import bump_board_version, publish_board_event
+from utils.counters import project_summary, reconcile_counters
+from utils.transfer import ImportFormatError, export_csv, export_ndjson, import_records
+from utils.integrity import is_unique_violation
+import logging
 
 project = APIRouter()
+logger = logging.getLogger(__name__)
+
+async def get_user_project(db: AsyncSession, user_id: int, project_id: int):
+    """取得使用者參與的專案，只用 projects 與 user_projects 的主鍵查詢。"""
+    return await db.scalar(select(Project).join(UserProject, UserProject.project_id == Project.id).where(UserProject.user_id == user_id, Project.id == project_id))
+
+def duplicate_name_response(is_htmx: bool):
+    if is_htmx:
+        error_content = f"""<div id="error-message" class="bg-red-100 border border-red-400 text-red-700 px-4 py-3 rounded mb-4">您已有同名專案</div>"""
+        message_data = {
+            "message": "您已經建立過相同名稱的專案。",
+            "type": "error",
+        }
+        content_message = f"""<div id="message-data" style="display:none;" data-message="{message_data['message']}" data-type="{message_data['type']}"></div>{error_content}"""
+        return HTMLResponse(content=content_message, status_code=400)
+    raise HTTPException(status_code=400, detail="您已經建立過相同名稱的專案。")
 
 @project.get("/")
-async def index(request: Request, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    projects = db.query(Project).join(UserProject, UserProject.project_id == Project.id).filter(UserProject.user_id == current_user.id).order_by(Project.name.desc()).all()
+async def index(request: Request, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    projects = (await db.scalars(select(Project).join(UserProject, UserProject.project_id == Project.id).where(UserProject.user_id == current_user.id).order_by(Project.name.desc()))).all()
     flash_category, flash_message = get_flash_message(request)
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
@@ -26,31 +49,26 @@ async def index(request: Request, current_user: User = Depends(get_current_activ
         return templates.TemplateResponse("projects/index.html", {"request": request, "projects": projects, "current_user": current_user, "flash_category": flash_category, "flash_message": flash_message})
 
 @project.post("/")
-async def create(request: Request, name: Annotated[str, Form()], current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def create(request: Request, name: Annotated[str, Form()], current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     create_data = ProjectCreate(name = name)
-    project = db.query(Project).join(UserProject, UserProject.project_id == Project.id).filter(UserProject.user_id == current_user.id, Project.name == create_data.name).first()
+    project = await db.scalar(select(Project).join(UserProject, UserProject.project_id == Project.id).where(UserProject.user_id == current_user.id, Project.name == create_data.name))
     is_htmx = request.headers.get("HX-Request") == "true"
     if project:
-        if is_htmx:
-            error_content = f"""<div id="error-message" class="bg-red-100 border border-red-400 text-red-700 px-4 py-3 rounded mb-4">您已有同名專案</div>"""
-            message_data = {
-                "message": "您已經建立過相同名稱的專案。",
-                "type": "error",
-            }
-            content_message = f"""<div id="message-data" style="display:none;" data-message="{message_data['message']}" data-type="{message_data['type']}"></div>{error_content}"""
-            return HTMLResponse(content=content_message, status_code=400)
-        else:
-            raise HTTPException(status_code=400, detail="您已經建立過相同名稱的專案。")
-    new_projects = Project(name = create_data.name)
+        return duplicate_name_response(is_htmx)
+    new_projects = Project(name = create_data.name, owner_id = current_user.id)
     db.add(new_projects)
-    db.commit()
-    db.refresh(new_projects)
-    user_project = UserProject(user_id = current_user.id, project_id = new_projects.id)
-    db.add(user_project)
-    db.commit()
-    is_htmx = request.headers.get("HX-Request") == "true"
+    try:
+        await db.flush()
+        db.add(UserProject(user_id = current_user.id, project_id = new_projects.id))
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        # 同時送出的相同名稱由唯一約束擋下
+        if is_unique_violation(e, "uq_projects_owner_id_name"):
+            return duplicate_name_response(is_htmx)
+        raise
     if is_htmx:
-        projects = db.query(Project).join(UserProject, UserProject.project_id == Project.id).filter(UserProject.user_id == current_user.id).order_by(Project.name.desc()).all()
+        projects = (await db.scalars(select(Project).join(UserProject, UserProject.project_id == Project.id).where(UserProject.user_id == current_user.id).order_by(Project.name.desc()))).all()
         content = templates.get_template("projects/partials/projects_list.html").render({"projects": projects, "request": request, "current_user": current_user})
         message_data = {
             "message": f"專案 {name} 建立成功。",
@@ -62,7 +80,7 @@ async def create(request: Request, name: Annotated[str, Form()], current_user: U
         return RedirectResponse(url="/projects", status_code=status.HTTP_302_FOUND)
 
 @project.get("/new")
-async def new(request: Request, current_user: User = Depends(get_current_active_user)):
+async def new(request: Request, current_user: CachedUser = Depends(get_current_active_user)):
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
         content = templates.get_template("projects/partials/projects_form.html").render({"request": request})
@@ -70,29 +88,23 @@ async def new(request: Request, current_user: User = Depends(get_current_active_
     else:
         return templates.TemplateResponse("projects/new.html", {"request": request})
 
-@project.post("/{project_name}/update")
-async def update(project_name: str, name: Annotated[str, Form()], request: Request, description: Annotated[Optional[str], Form()] = None, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+@project.post("/{project_id:int}/update")
+async def update(project_id: int, name: Annotated[str, Form()], request: Request, description: Annotated[Optional[str], Form()] = None, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     update_data = ProjectUpdate(name = name, description = description)
-    project = db.query(Project).join(UserProject, UserProject.project_id == Project.id).filter(UserProject.user_id == current_user.id, Project.name == project_name).first()
+    project = await get_user_project(db, current_user.id, project_id)
     if not project:
         raise HTTPException(status_code=404, detail="查無專案。")
-    existing_project = db.query(Project).join(UserProject, UserProject.project_id == Project.id).filter(UserProject.user_id == current_user.id, Project.name == update_data.name, Project.id != project.id).first()
+    existing_project = await db.scalar(select(Project).join(UserProject, UserProject.project_id == Project.id).where(UserProject.user_id == current_user.id, Project.name == update_data.name, Project.id != project.id))
     if existing_project:
-        if request.headers.get("HX-Request") == "true":
-            error_content = f"""<div id="error-message" class="bg-red-100 border border-red-400 text-red-700 px-4 py-3 rounded mb-4">您已有同名專案</div>"""
-            message_data = {
-                "message": "您已經建立過相同名稱的專案。",
-                "type": "error",
-            }
-            content_message = f"""<div id="message-data" style="display:none;" data-message="{message_data['message']}" data-type="{message_data['type']}"></div>{error_content}"""
-            return HTMLResponse(content=content_message, status_code=400)
-        else:
-            raise HTTPException(status_code=400, detail="您已經建立過相同名稱的專案。")
+        return duplicate_name_response(request.headers.get("HX-Request") == "true")
     try:
         project.name = update_data.name
         if description is not None:
             project.description = update_data.description
-        db.commit()
+        # 看板標題會顯示專案名稱與描述
+        await bump_board_version(db, project.id)
+        await db.commit()
+        await publish_board_event(request, project.id, "board.reset")
         is_htmx = request.headers.get("HX-Request") == "true"
         if is_htmx:
             content = templates.get_template("projects/partials/projects_show.html").render({"request": request, "projects": project, "current_user": current_user})
@@ -104,17 +116,24 @@ async def update(project_name: str, name: Annotated[str, Form()], request: Reque
             return HTMLResponse(content=content_message)
         else:
             return RedirectResponse(url="/projects", status_code=status.HTTP_302_FOUND)
+    except IntegrityError as e:
+        await db.rollback()
+        # 共用專案改名時，可能與擁有者的其他專案同名
+        if is_unique_violation(e, "uq_projects_owner_id_name"):
+            return duplicate_name_response(request.headers.get("HX-Request") == "true")
+        logger.exception("更新專案時發生錯誤")
+        raise HTTPException(status_code=500, detail=f"更新專案時發生錯誤: {str(e)}")
     except Exception as e:
-        db.rollback()
-        print(f"更新專案時發生錯誤: {str(e)}")
+        await db.rollback()
+        logger.exception("更新專案時發生錯誤")
         raise HTTPException(status_code=500, detail=f"更新專案時發生錯誤: {str(e)}")
 
-@project.get("/{project_name}")
-async def show(request: Request, project_name: str, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    projects = db.query(Project).join(UserProject, UserProject.project_id == Project.id).filter(UserProject.user_id == current_user.id, Project.name == project_name).order_by(Project.name.desc()).first()
+@project.get("/{project_id:int}")
+async def show(request: Request, project_id: int, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    projects = await get_user_project(db, current_user.id, project_id)
     if not projects:
         raise HTTPException(status_code=404, detail="查無專案。")
-    lanes = db.query(Lane).filter(Lane.project_id == projects.id).all()
+    lanes = (await db.scalars(select(Lane).where(Lane.project_id == projects.id))).all()
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
         content = templates.get_template("projects/partials/projects_show.html").render({"request": request, "projects": projects, "lanes": lanes, "current_user": current_user})
@@ -122,9 +141,58 @@ async def show(request: Request, project_name: str, current_user: User = Depends
     else:
         return templates.TemplateResponse("projects/show.html", {"request": request, "projects": projects, "lanes": lanes, "current_user": current_user})
 
-@project.get("/{project_name}/edit")
-async def edit(request: Request, project_name: str, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    projects = db.query(Project).join(UserProject, UserProject.project_id == Project.id).filter(UserProject.user_id == current_user.id, Project.name == project_name).order_by(Project.name.desc()).first()
+# 看板摘要：各泳道、指派對象與狀態的任務數，讀取預先維護的計數而非掃描任務
+@project.get("/{project_id:int}/summary")
+async def summary(request: Request, project_id: int, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    result = await project_summary(db, current_user.id, project_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail="查無專案。")
+    return result
+
+# 以串流匯出專案的泳道與任務（NDJSON 或 CSV）
+@project.get("/{project_id:int}/export")
+async def export(request: Request, project_id: int, format: str = Query("ndjson", pattern="^(ndjson|csv)$"), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    if not await get_user_project(db, current_user.id, project_id):
+        raise HTTPException(status_code=404, detail="查無專案。")
+    # 串流會自行開啟 Session，先歸還請求的連線
+    await db.close()
+    if format == "csv":
+        content, media_type = export_csv(project_id), "text/csv; charset=utf-8"
+    else:
+        content, media_type = export_ndjson(project_id), "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="project-{project_id}.{format}"'}
+    return StreamingResponse(content, media_type=media_type, headers=headers)
+
+# 匯入匯出檔，於單一交易中以多筆 INSERT 寫入
+@project.post("/{project_id:int}/import")
+async def import_project(project_id: int, request: Request, file: UploadFile = File(...), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    if not await get_user_project(db, current_user.id, project_id):
+        raise HTTPException(status_code=404, detail="查無專案。")
+    fmt = "csv" if (file.filename or "").lower().endswith(".csv") else "ndjson"
+    is_htmx = request.headers.get("HX-Request") == "true"
+    try:
+        counts = await import_records(db, project_id, file.file, fmt)
+        await bump_board_version(db, project_id)
+        await reconcile_counters(db, [project_id])
+        await db.commit()
+    except (ImportFormatError, UnicodeDecodeError) as e:
+        await db.rollback()
+        message = str(e) if isinstance(e, ImportFormatError) else "檔案必須為 UTF-8 編碼。"
+        if is_htmx:
+            return HTMLResponse(content=f"""<div id="message-data" style="display:none;" data-message="{message}" data-type="error"></div>""", status_code=400)
+        raise HTTPException(status_code=400, detail=message)
+    await publish_board_event(request, project_id, "board.reset")
+    if is_htmx:
+        message_data = {
+            "message": f"匯入完成：新增 {counts['lanes']} 個泳道、{counts['tasks']} 個任務，略過 {counts['skipped']} 個重複任務。",
+            "type": "success",
+        }
+        return HTMLResponse(content=f"""<div id="message-data" style="display:none;" data-message="{message_data['message']}" data-type="{message_data['type']}"></div>""")
+    return counts
+
+@project.get("/{project_id:int}/edit")
+async def edit(request: Request, project_id: int, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    projects = await get_user_project(db, current_user.id, project_id)
     if not projects:
         raise HTTPException(status_code=404, detail="查無專案名稱。")
     is_htmx = request.headers.get("HX-Request") == "true"
@@ -134,20 +202,20 @@ async def edit(request: Request, project_name: str, current_user: User = Depends
     else:
         return templates.TemplateResponse("projects/edit.html", {"request": request, "projects": projects, "current_user": current_user})
 
-@project.post("/{project_name}/delete")
-async def delete(project_name: str, request: Request, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    proj = db.query(Project).join(UserProject, UserProject.project_id == Project.id).filter(UserProject.user_id == current_user.id, Project.name == project_name).first()
+@project.post("/{project_id:int}/delete")
+async def delete(project_id: int, request: Request, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    proj = await get_user_project(db, current_user.id, project_id)
     if proj:
         try:
-            db.query(UserProject).filter(UserProject.project_id == proj.id).delete()
-            db.delete(proj)
-            db.commit()
+            await db.execute(sql_delete(UserProject).where(UserProject.project_id == proj.id))
+            await db.delete(proj)
+            await db.commit()
             is_htmx = request.headers.get("HX-Request") == "true"
             if is_htmx:
-                projects = db.query(Project).join(UserProject, UserProject.project_id == Project.id).filter(UserProject.user_id == current_user.id).order_by(Project.name.desc()).all()
+                projects = (await db.scalars(select(Project).join(UserProject, UserProject.project_id == Project.id).where(UserProject.user_id == current_user.id).order_by(Project.name.desc()))).all()
                 content = templates.get_template("projects/partials/projects_list.html").render({"projects": projects, "request": request, "current_user": current_user})
                 message_data = {
-                    "message": f"專案 {project_name} 已刪除成功。",
+                    "message": f"專案 {proj.name} 已刪除成功。",
                     "type": "success",
                 }
                 content_message = f"""<div id="message-data" style="display:none;" data-message="{message_data['message']}" data-type="{message_data['type']}"></div>{content}"""
@@ -155,8 +223,21 @@ async def delete(project_name: str, request: Request, current_user: User = Depen
             else:
                 return RedirectResponse(url="/projects", status_code=status.HTTP_302_FOUND)
         except Exception as e:
-            db.rollback()
-            print(f"刪除專案時發生錯誤: {str(e)}")
+            await db.rollback()
+            logger.exception("刪除專案時發生錯誤")
             raise HTTPException(status_code=500, detail=f"刪除專案時發生錯誤: {str(e)}")
     else:
-        raise HTTPException(status_code=404, detail="查無專案。")
\ No newline at end of file
+        raise HTTPException(status_code=404, detail="查無專案。")
+
+# 舊的名稱網址：只查出 id 後導向，307 讓表單送出也保留方法與內容
+@project.api_route("/{project_name}", methods=["GET"])
+@project.api_route("/{project_name}/{action}", methods=["GET", "POST"])
+async def redirect_by_name(request: Request, project_name: str, action: Optional[Literal["edit", "update", "delete", "export", "import"]] = None, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    # 自己擁有的專案優先，其次是共用專案中 id 最小的一筆
+    project_id = await db.scalar(select(Project.id).join(UserProject, UserProject.project_id == Project.id).where(UserProject.user_id == current_user.id, Project.name == project_name).order_by((Project.owner_id == current_user.id).desc().nulls_last(), Project.id).limit(1))
+    if project_id is None:
+        raise HTTPException(status_code=404, detail="查無專案。")
+    url = f"/projects/{project_id}" + (f"/{action}" if action else "")
+    if request.url.query:
+        url += f"?{request.url.query}"
+    return RedirectResponse(url=url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
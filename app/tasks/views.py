@@ -1,139 +1,196 @@
-from fastapi import APIRouter, Depends, Request, Form, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, Request, Form, HTTPException, status, Query
 from app import templates
 from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy.orm import Session, selectinload
-from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from utils.get_db import get_db
 from models.task import Task
 from models.lane import Lane
-from models.user import User
+from utils.user_cache import CachedUser
 from models.project import Project
 from typing import Annotated, Optional
-from schemas.task import TaskCreate, TaskUpdate
+from collections import Counter
+from schemas.task import TaskBatch, TaskCreate, TaskUpdate
 from utils.auth import get_current_active_user
+from utils.board import bump_board_version, bump_board_version_for_lanes, publish_board_event, render_board
+from utils.counters import adjust_counters, task_deltas
+from utils.position import move_to_index, next_position
+from utils.pagination import PAGE_SIZE, keyset_page, page_size
+from utils.integrity import is_unique_violation
+from utils.task_batch import apply_task_batch
+from utils.search import search_tasks
+import logging
 
 task = APIRouter()
+logger = logging.getLogger(__name__)
 
 @task.get("/empty")
 async def empty(request: Request):
     return HTMLResponse(content="")
 
 @task.patch("/{task_id}/position")
-async def update_position(task_id: int, request: Request, new_index: Annotated[int, Form()], target_lane_id: Annotated[Optional[int], Form()] = None, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def update_position(task_id: int, request: Request, background_tasks: BackgroundTasks, new_index: Annotated[int, Form()], target_lane_id: Annotated[Optional[int], Form()] = None, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     new_index = int(new_index)
     if target_lane_id and target_lane_id != "":
         target_lane_id = int(target_lane_id)
-    task_obj = db.query(Task).filter(Task.id == task_id).first()
+    task_obj = await db.scalar(select(Task).where(Task.id == task_id))
     if not task_obj:
         raise HTTPException(status_code=404, detail="查無任務。")
     old_lane_id = task_obj.lane_id
     try:
+        deltas = Counter()
         # 如果目標泳道的id和當前泳道id不同，任務會被移動到新的泳道
         if target_lane_id and target_lane_id != old_lane_id:
             # 驗證新泳道是否存在
-            target_lane = db.query(Lane).filter(Lane.id == target_lane_id).first()
+            target_lane = await db.scalar(select(Lane).where(Lane.id == target_lane_id))
             if not target_lane:
                 raise HTTPException(status_code=404, detail="目標泳道不存在。")
-            # 更新舊泳道中的任務位置
-            tasks_in_old_lane = db.query(Task).filter(Task.lane_id == old_lane_id, Task.id != task_id).order_by(Task.position).all()
-            # 重新排序舊泳道中的任務
-            for i, t in enumerate(tasks_in_old_lane, start=1):
-                t.position = i
-                db.add(t)
-            # 取得新泳道中的任務
-            tasks_in_new_lane = db.query(Task).filter(Task.lane_id == target_lane_id).order_by(Task.position).all()
-            # 在新位置塞入任務
-            for i, t in enumerate(tasks_in_new_lane):
-                if i >= new_index:
-                    t.position = i + 1
-                    db.add(t)
-            # 更新任務的泳道和位置
+            old_project_id = await db.scalar(select(Lane.project_id).where(Lane.id == old_lane_id)) if old_lane_id else None
+            task_deltas(deltas, old_project_id, old_lane_id, task_obj.user_id, task_obj.status, -1)
+            task_deltas(deltas, target_lane.project_id, target_lane_id, task_obj.user_id, task_obj.status, 1)
+            # 舊泳道的排序值有間距，移出任務後不需重新編號
             task_obj.lane_id = target_lane_id
-            task_obj.position = new_index
-        else:
-            # 在同一泳道內移動
-            if old_lane_id:
-                tasks = db.query(Task).filter(Task.lane_id == old_lane_id, Task.id != task_id).order_by(Task.position).all()
-                # 塞入任務到新位置並更新其他任務位置
-                tasks_to_update = []
-                current_pos = 1
-                for i, t in enumerate(tasks):
-                    if current_pos == new_index:
-                        current_pos += 1
-                    t.position = current_pos
-                    tasks_to_update.append(t)
-                    current_pos += 1
-                for t in tasks_to_update:
-                    db.add(t)
-                task_obj.position = new_index
-        db.add(task_obj)
-        db.commit()
-        return {"success": True}
+        # 取前後任務的中間值作為新排序值，只更新被移動的任務
+        position = await move_to_index(db, task_obj, Task.lane_id, task_obj.lane_id, new_index, background_tasks)
+        project_ids = await bump_board_version_for_lanes(db, old_lane_id, task_obj.lane_id)
+        await adjust_counters(db, deltas)
+        await db.commit()
+        for project_id in project_ids:
+            await publish_board_event(request, project_id, "task.moved", task_id=task_id, lane_id=task_obj.lane_id, index=new_index)
+        return {"success": True, "position": position}
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
-        print(f"更新任務位置時出錯: {str(e)}")
+        await db.rollback()
+        logger.exception("更新任務位置時出錯")
         raise HTTPException(status_code=500, detail=f"更新任務位置失敗: {str(e)}")
 
+# 批次操作（移動、改名、刪除、指派），於單一交易中以集合式 SQL 套用
+@task.post("/batch")
+async def batch(request: Request, payload: TaskBatch, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    try:
+        project_ids, diff, deltas = await apply_task_batch(db, payload.operations)
+        await bump_board_version(db, *project_ids)
+        await adjust_counters(db, deltas)
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except IntegrityError as e:
+        await db.rollback()
+        if not is_unique_violation(e, "uq_tasks_lane_id_name"):
+            raise
+        raise HTTPException(status_code=400, detail="該泳道中已有相同名稱任務。")
+    for project_id in project_ids:
+        await publish_board_event(request, project_id, "board.reset")
+    is_htmx = request.headers.get("HX-Request") == "true"
+    if is_htmx and len(project_ids) == 1:
+        # 只影響單一看板時回傳整個看板片段，未變動的泳道會使用快取
+        content = await render_board(request, db, next(iter(project_ids)))
+        message_data = {
+            "message": f"已套用 {len(payload.operations)} 項操作。",
+            "type": "success",
+        }
+        content_message = f"""<div id="message-data" style="display:none;" data-message="{message_data['message']}" data-type="{message_data['type']}"></div>{content}"""
+        return HTMLResponse(content=content_message)
+    return {"success": True, **diff}
+
+# 搜尋使用者所屬專案中的任務，依相關度排序並以游標分頁
+@task.get("/search")
+async def search(request: Request, q: str = Query("", max_length=100), cursor: Optional[str] = Query(None), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    q = q.strip()
+    results, next_cursor = [], None
+    if q:
+        results, next_cursor = await search_tasks(db, current_user.id, q, cursor)
+    context = {"request": request, "results": results, "next_cursor": next_cursor, "q": q, "cursor": cursor, "current_user": current_user}
+    is_htmx = request.headers.get("HX-Request") == "true"
+    if is_htmx:
+        content = templates.get_template("tasks/partials/search_results.html").render(context)
+        return HTMLResponse(content=content)
+    else:
+        return templates.TemplateResponse("tasks/search.html", context)
+
 @task.get("/")
-async def index(request: Request, lane_id: Optional[int] = Query(None), current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def index(request: Request, lane_id: Optional[int] = Query(None), cursor: Optional[str] = Query(None), limit: int = Query(PAGE_SIZE, ge=1), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     if lane_id:
-        tasks = db.query(Task).options(selectinload(Task.lane)).filter(Task.lane_id == lane_id).order_by(Task.position).all()
-        lane = db.query(Lane).filter(Lane.id == lane_id).first()
+        lane = await db.scalar(select(Lane).where(Lane.id == lane_id))
         if not lane:
             raise HTTPException(status_code=404, detail="查無泳道。")
+        # 泳道內的任務依 (排序值, id) 分頁，走 ix_tasks_lane_id_position 索引
+        limit = page_size(limit)
         is_htmx = request.headers.get("HX-Request") == "true"
+        if is_htmx and request.headers.get("HX-Target") == f"task-page-{lane_id}":
+            # 看板上的泳道捲動到載入點時，回傳下一頁卡片與新的載入點
+            tasks, next_cursor = await keyset_page(db, select(Task).where(Task.lane_id == lane_id), (Task.position, Task.id), cursor, limit)
+            content = templates.get_template("tasks/partials/board_tasks_page.html").render({"request": request, "tasks": tasks, "lane": lane, "cursor": cursor, "next_cursor": next_cursor, "limit": limit})
+            return HTMLResponse(content=content)
+        tasks, next_cursor = await keyset_page(db, select(Task).options(selectinload(Task.lane)).where(Task.lane_id == lane_id), (Task.position, Task.id), cursor, limit)
+        context = {"request": request, "tasks": tasks, "lane": lane, "project_id": lane.project_id, "next_cursor": next_cursor, "limit": limit, "current_user": current_user}
         if is_htmx:
-            content = templates.get_template("tasks/partials/tasks_list.html").render({"request": request, "tasks": tasks, "lane": lane, "project_id": lane.project_id, "current_user": current_user})
+            template = "tasks/partials/tasks_page.html" if cursor else "tasks/partials/tasks_list.html"
+            content = templates.get_template(template).render(context)
             return HTMLResponse(content=content)
         else:
-            return templates.TemplateResponse("tasks/index.html", {"request": request, "tasks": tasks, "lane": lane, "project_id": lane.project_id, "current_user": current_user})
+            return templates.TemplateResponse("tasks/index.html", context)
     else:
-        tasks = db.query(Task).options(selectinload(Task.lane)).order_by(Task.position).all()
+        # 全部任務以 id 分頁，每頁筆數有上限
+        limit = page_size(limit)
+        tasks, next_cursor = await keyset_page(db, select(Task).options(selectinload(Task.lane)), (Task.id,), cursor, limit)
         is_htmx = request.headers.get("HX-Request") == "true"
         if is_htmx:
-            content = templates.get_template("tasks/partials/tasks_list.html").render({"request": request, "tasks": tasks, "lane": None, "current_user": current_user})
+            # 「載入更多」只回傳下一頁的項目
+            template = "tasks/partials/tasks_page.html" if cursor else "tasks/partials/tasks_list.html"
+            content = templates.get_template(template).render({"request": request, "tasks": tasks, "lane": None, "next_cursor": next_cursor, "limit": limit, "current_user": current_user})
             return HTMLResponse(content=content)
         else:
-            return templates.TemplateResponse("tasks/index.html", {"request": request, "tasks": tasks, "lane": None, "current_user": current_user})
+            return templates.TemplateResponse("tasks/index.html", {"request": request, "tasks": tasks, "lane": None, "next_cursor": next_cursor, "limit": limit, "current_user": current_user})
 
 @task.post("/")
-async def create(request: Request, name: Annotated[str, Form()], lane_id: Annotated[Optional[int], Form()] = None, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def create(request: Request, name: Annotated[str, Form()], lane_id: Annotated[Optional[int], Form()] = None, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     create_data = TaskCreate(name=name, lane_id=lane_id)
     project_id = None
     if lane_id:
-        existing_task = db.query(Task).filter(Task.name == create_data.name, Task.lane_id == lane_id).first()
-        if existing_task:
-            if request.headers.get("HX-Request") == "true":
-                error_content = templates.get_template("common/error_message.html").render({"message": "該泳道已存在此任務名稱"})
-                return HTMLResponse(content=error_content, status_code=400)
-            else:
-                raise HTTPException(status_code=400, detail="該泳道已存在此任務名稱。")
-        lane = db.query(Lane).filter(Lane.id == lane_id).first()
+        lane = await db.scalar(select(Lane).where(Lane.id == lane_id))
         if not lane:
             raise HTTPException(status_code=404, detail="查無泳道。")
         project_id = lane.project_id
-    if lane_id:
-        max_position = db.query(func.max(Task.position)).filter(Task.lane_id == lane_id).scalar() or 0
-    else:
-        max_position = db.query(func.max(Task.position)).scalar() or 0
-    new_task = Task(name=create_data.name, lane_id=lane_id, position=max_position + 1)
+    position = await next_position(db, Task, Task.lane_id, lane_id)
+    new_task = Task(name=create_data.name, lane_id=lane_id, position=position)
     db.add(new_task)
-    db.commit()
-    db.refresh(new_task)
+    await bump_board_version(db, project_id)
+    await adjust_counters(db, task_deltas(Counter(), project_id, lane_id, None, None, 1))
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        # 同一泳道內的任務名稱由唯一約束保證，不需事先查詢
+        if not is_unique_violation(e, "uq_tasks_lane_id_name"):
+            raise
+        if request.headers.get("HX-Request") == "true":
+            error_content = templates.get_template("common/error_message.html").render({"message": "該泳道已存在此任務名稱"})
+            return HTMLResponse(content=error_content, status_code=400)
+        else:
+            raise HTTPException(status_code=400, detail="該泳道已存在此任務名稱。")
+    await db.refresh(new_task)
+    await publish_board_event(request, project_id, "task.created", task_id=new_task.id, lane_id=lane_id)
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
         message_data = {
             "message": f"任務 {name} 建立成功。",
             "type": "success",
         }
-        message_html = templates.get_template("common/message_data.html").render(message_data)
         if lane_id:
-            tasks = db.query(Task).options(selectinload(Task.lane)).filter(Task.lane_id == lane_id).order_by(Task.position).all()
-            tasks_html = templates.get_template("tasks/partials/lane_tasks.html").render({"request": request, "tasks": tasks, "current_user": current_user})
-            return HTMLResponse(content=f"{message_html}{tasks_html}")
+            # 只回傳新任務卡片附加到泳道尾端，訊息以 hx-swap-oob 帶回
+            card_html = templates.get_template("tasks/partials/board_task.html").render({"request": request, "task": new_task})
+            message_html = templates.get_template("common/message_oob.html").render(message_data)
+            return HTMLResponse(content=f"{card_html}{message_html}")
         else:
-            tasks = db.query(Task).options(selectinload(Task.lane)).order_by(Task.position).all()
-            content = templates.get_template("tasks/partials/tasks_list.html").render({"request": request, "tasks": tasks, "lane": None, "current_user": current_user})
+            message_html = templates.get_template("common/message_data.html").render(message_data)
+            tasks, next_cursor = await keyset_page(db, select(Task).options(selectinload(Task.lane)), (Task.id,))
+            content = templates.get_template("tasks/partials/tasks_list.html").render({"request": request, "tasks": tasks, "lane": None, "next_cursor": next_cursor, "limit": PAGE_SIZE, "current_user": current_user})
             return HTMLResponse(content=f"{message_html}{content}")
     else:
         if project_id:
@@ -141,15 +198,15 @@ async def create(request: Request, name: Annotated[str, Form()], lane_id: Annota
         return RedirectResponse(url="/lanes", status_code=status.HTTP_302_FOUND)
 
 @task.get("/new")
-async def new(request: Request, lane_id: Optional[int] = Query(None), project_id: Optional[int] = Query(None), current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def new(request: Request, lane_id: Optional[int] = Query(None), project_id: Optional[int] = Query(None), current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     lane = None
     lanes = []
     if lane_id:
-        lane = db.query(Lane).filter(Lane.id == lane_id).first()
+        lane = await db.scalar(select(Lane).where(Lane.id == lane_id))
         if not lane:
             raise HTTPException(status_code=404, detail="查無泳道。")
     else:
-        lanes = db.query(Lane).all()
+        lanes = (await db.scalars(select(Lane))).all()
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
         content = templates.get_template("tasks/partials/tasks_form.html").render({"request": request, "lane": lane, "lanes": lanes, "project_id": project_id, "current_user": current_user})
@@ -158,37 +215,45 @@ async def new(request: Request, lane_id: Optional[int] = Query(None), project_id
         return templates.TemplateResponse("tasks/new.html", {"request": request, "lane": lane, "project_id": project_id, "current_user": current_user})
 
 @task.post("/{task_id}/update")
-async def update(task_id: int, name: Annotated[str, Form()], request: Request, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
+async def update(task_id: int, name: Annotated[str, Form()], request: Request, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
     update_data = TaskUpdate(name=name)
-    task_obj = db.query(Task).options(selectinload(Task.lane)).filter(Task.id == task_id).first()
+    task_obj = await db.scalar(select(Task).options(selectinload(Task.lane)).where(Task.id == task_id))
     if not task_obj:
         raise HTTPException(status_code=404, detail="查無任務。")
     lane_id = task_obj.lane_id
     project_id = None
     old_name = task_obj.name
     if lane_id:
-        lane = db.query(Lane).filter(Lane.id == lane_id).first()
+        lane = await db.scalar(select(Lane).where(Lane.id == lane_id))
         if lane:
             project_id = lane.project_id
-        existing_task = db.query(Task).filter(Task.name == update_data.name, Task.id != task_id, Task.lane_id == lane_id).first()
-        if existing_task:
-            if request.headers.get("HX-Request") == "true":
-                error_content = templates.get_template("common/error_message.html").render({"message": "該泳道中已有相同名稱任務。"})
-                return HTMLResponse(content=error_content, status_code=400)
-            else:
-                raise HTTPException(status_code=400, detail="該泳道中已有相同名稱任務。")
     task_obj.name = update_data.name
-    db.commit()
-    db.refresh(task_obj)
+    await bump_board_version(db, project_id)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        if not is_unique_violation(e, "uq_tasks_lane_id_name"):
+            raise
+        if request.headers.get("HX-Request") == "true":
+            error_content = templates.get_template("common/error_message.html").render({"message": "該泳道中已有相同名稱任務。"})
+            return HTMLResponse(content=error_content, status_code=400)
+        else:
+            raise HTTPException(status_code=400, detail="該泳道中已有相同名稱任務。")
+    await publish_board_event(request, project_id, "task.updated", task_id=task_id)
+    await db.refresh(task_obj)
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
+        if request.headers.get("HX-Target") == f"task-{task_id}":
+            # 看板上的行內編輯只替換該任務卡片
+            card_html = templates.get_template("tasks/partials/board_task.html").render({"request": request, "task": task_obj})
+            message_html = templates.get_template("common/message_oob.html").render({"message": f"任務 {old_name} 已更新為 {name}。", "type": "success"})
+            return HTMLResponse(content=f"{card_html}{message_html}")
         if project_id:
-            lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).filter(Lane.project_id == project_id).order_by(Lane.position).all()
-            project = db.query(Project).filter(Project.id == project_id).first()
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "project": project, "current_user": current_user})
+            content = await render_board(request, db, project_id)
         else:
-            lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).order_by(Lane.position).all()
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "current_user": current_user})
+            lanes, next_cursor = await keyset_page(db, select(Lane).options(selectinload(Lane.project)), (Lane.id,))
+            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "next_cursor": next_cursor, "limit": PAGE_SIZE, "current_user": current_user})
         message_data = {
             "message": f"任務 {old_name} 已更新為 {name}。",
             "type": "success",
@@ -200,9 +265,17 @@ async def update(task_id: int, name: Annotated[str, Form()], request: Request, c
             return RedirectResponse(url=f"/lanes?project_id={project_id}", status_code=status.HTTP_302_FOUND)
         return RedirectResponse(url="/lanes", status_code=status.HTTP_302_FOUND)
 
+@task.get("/{task_id}/card")
+async def card(request: Request, task_id: int, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    task_obj = await db.scalar(select(Task).where(Task.id == task_id))
+    if not task_obj:
+        raise HTTPException(status_code=404, detail="查無任務。")
+    content = templates.get_template("tasks/partials/board_task.html").render({"request": request, "task": task_obj})
+    return HTMLResponse(content=content)
+
 @task.get("/{task_id}/edit")
-async def edit(request: Request, task_id: int, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    task_obj = db.query(Task).options(selectinload(Task.lane)).filter(Task.id == task_id).first()
+async def edit(request: Request, task_id: int, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    task_obj = await db.scalar(select(Task).options(selectinload(Task.lane)).where(Task.id == task_id))
     if not task_obj:
         raise HTTPException(status_code=404, detail="查無任務。")
     project_id = None
@@ -210,34 +283,40 @@ async def edit(request: Request, task_id: int, current_user: User = Depends(get_
     if task_obj.lane and task_obj.lane.project_id:
         project_id = task_obj.lane.project_id
         return_url = f"/lanes?project_id={project_id}"
-    lanes = db.query(Lane).all()
+    lanes = (await db.scalars(select(Lane))).all()
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
-        content = templates.get_template("tasks/partials/tasks_edit.html").render({"request": request, "task": task_obj, "lanes": lanes, "project_id": project_id, "current_user": current_user, "return_url": return_url})
+        inline = request.headers.get("HX-Target") == f"task-{task_id}"
+        content = templates.get_template("tasks/partials/tasks_edit.html").render({"request": request, "task": task_obj, "lanes": lanes, "project_id": project_id, "current_user": current_user, "return_url": return_url, "inline": inline})
         return HTMLResponse(content=content)
     else:
         return templates.TemplateResponse("tasks/edit.html", {"request": request, "task": task_obj, "lanes": lanes, "project_id": project_id, "current_user": current_user})
 
 @task.post("/{task_id}/delete")
-async def delete(task_id: int, request: Request, current_user: User = Depends(get_current_active_user), db: Session = Depends(get_db)):
-    task_obj = db.query(Task).options(selectinload(Task.lane)).filter(Task.id == task_id).first()
+async def delete(task_id: int, request: Request, current_user: CachedUser = Depends(get_current_active_user), db: AsyncSession = Depends(get_db)):
+    task_obj = await db.scalar(select(Task).options(selectinload(Task.lane)).where(Task.id == task_id))
     if not task_obj:
         raise HTTPException(status_code=404, detail="查無任務。")    
     task_name = task_obj.name
     project_id = None
     if task_obj.lane and task_obj.lane.project_id:
         project_id = task_obj.lane.project_id
-    db.delete(task_obj)
-    db.commit()
+    await db.delete(task_obj)
+    await bump_board_version(db, project_id)
+    await adjust_counters(db, task_deltas(Counter(), project_id, task_obj.lane_id, task_obj.user_id, task_obj.status, -1))
+    await db.commit()
+    await publish_board_event(request, project_id, "task.deleted", task_id=task_id)
     is_htmx = request.headers.get("HX-Request") == "true"
     if is_htmx:
+        if request.headers.get("HX-Target") == f"task-{task_id}":
+            # 卡片以空內容替換即移除，只需帶回訊息
+            message_html = templates.get_template("common/message_oob.html").render({"message": f"任務 {task_name} 已刪除。", "type": "success"})
+            return HTMLResponse(content=message_html)
         if project_id:
-            lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).filter(Lane.project_id == project_id).order_by(Lane.position).all()
-            project = db.query(Project).filter(Project.id == project_id).first()
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "project": project, "current_user": current_user})
+            content = await render_board(request, db, project_id)
         else:
-            lanes = db.query(Lane).options(selectinload(Lane.project), selectinload(Lane.tasks)).order_by(Lane.position).all()
-            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "current_user": current_user})
+            lanes, next_cursor = await keyset_page(db, select(Lane).options(selectinload(Lane.project)), (Lane.id,))
+            content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": lanes, "next_cursor": next_cursor, "limit": PAGE_SIZE, "current_user": current_user})
         message_data = {
             "message": f"任務 {task_name} 已刪除。",
             "type": "success",
@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, Request, Form, HTTPException, status, Cookie
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, Optional
 from datetime import timedelta
 from app import templates
@@ -14,27 +15,33 @@ from utils.auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from models.user import User
+from utils.user_cache import CachedUser, user_cache
+from utils.hashing import HashingBusyError
+from utils.templating import static_page_response
 import urllib.parse
 
 user = APIRouter()
 
 @user.get("/register")
 def register_form(request: Request):
-    return templates.TemplateResponse("auth/register.html", {"request": request})
+    return static_page_response(templates, "auth/register.html", request)
 
 @user.post("/register")
-def register(request: Request, name: Annotated[str, Form()], email: Annotated[str, Form()], password: Annotated[str, Form()], password_confirmation: Annotated[str, Form()], db: Session = Depends(get_db)):
+async def register(request: Request, name: Annotated[str, Form()], email: Annotated[str, Form()], password: Annotated[str, Form()], password_confirmation: Annotated[str, Form()], db: AsyncSession = Depends(get_db)):
     if password != password_confirmation:
         return templates.TemplateResponse("auth/register.html", {"request": request, "error": "密碼與確認密碼不匹配"}, status_code=400)
-    existing_user = db.query(User).filter(User.email == email).first()
+    existing_user = await db.scalar(select(User).where(User.email == email))
     if existing_user:
         return templates.TemplateResponse("auth/register.html", {"request": request, "error": "該郵箱已被註冊"}, status_code=400)
-    hashed_password = get_password_hash(password)
+    try:
+        hashed_password = await get_password_hash(password)
+    except HashingBusyError:
+        return templates.TemplateResponse("auth/register.html", {"request": request, "error": "系統忙碌中，請稍後再試"}, status_code=503)
     new_user = User(name=name, email=email, password=hashed_password)
     db.add(new_user)
-    db.commit()
+    await db.commit()
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": email}, expires_delta=access_token_expires)
+    access_token = create_access_token(data={"sub": email, "uid": new_user.id}, expires_delta=access_token_expires)
     encoded_name = urllib.parse.quote(name)
     response = RedirectResponse(url=f"/projects?register=success&name={encoded_name}", status_code=status.HTTP_302_FOUND)
     response.set_cookie(key="access_token", value=f"Bearer {access_token}", httponly=True)
@@ -42,15 +49,18 @@ def register(request: Request, name: Annotated[str, Form()], email: Annotated[st
 
 @user.get("/login")
 def login_form(request: Request):
-    return templates.TemplateResponse("auth/login.html", {"request": request})
+    return static_page_response(templates, "auth/login.html", request)
 
 @user.post("/login")
-async def login(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(request: Request, form_data: Annotated[OAuth2PasswordRequestForm, Depends()], db: AsyncSession = Depends(get_db)):
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except HashingBusyError:
+        return templates.TemplateResponse("auth/login.html", {"request": request, "error": "系統忙碌中，請稍後再試"}, status_code=503)
     if not user:
         return templates.TemplateResponse("auth/login.html", {"request": request, "error": "無效的電子郵件或密碼"}, status_code=400)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": user.email}, expires_delta=access_token_expires)
+    access_token = create_access_token(data={"sub": user.email, "uid": user.id}, expires_delta=access_token_expires)
     response = RedirectResponse(url=f"/projects?login=success&name={urllib.parse.quote(user.name)}", status_code=status.HTTP_302_FOUND)
     response.set_cookie(key="access_token", value=f"Bearer {access_token}", httponly=True)
     return response
@@ -62,58 +72,74 @@ def logout():
     return response
 
 @user.get("/")
-async def index(request: Request, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    users = db.query(User).all()
+async def index(request: Request, db: AsyncSession = Depends(get_db), current_user: CachedUser = Depends(get_current_active_user)):
+    users = (await db.scalars(select(User))).all()
     return templates.TemplateResponse("users/index.html", {"request": request, "users": users})
 
 @user.post("/")
-async def create(request: Request, name: Annotated[str, Form()], password: Annotated[str, Form()], email: Annotated[str, Form()], db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    existing_user = db.query(User).filter(User.email == email).first()
+async def create(request: Request, name: Annotated[str, Form()], password: Annotated[str, Form()], email: Annotated[str, Form()], db: AsyncSession = Depends(get_db), current_user: CachedUser = Depends(get_current_active_user)):
+    existing_user = await db.scalar(select(User).where(User.email == email))
     if existing_user:
         raise HTTPException(status_code=400, detail="電子郵件已被註冊")
-    hashed_password = get_password_hash(password)
+    try:
+        hashed_password = await get_password_hash(password)
+    except HashingBusyError:
+        raise HTTPException(status_code=503, detail="系統忙碌中，請稍後再試")
     new_user = User(name=name, password=hashed_password, email=email)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    users = db.query(User).all()
+    await db.commit()
+    await db.refresh(new_user)
+    users = (await db.scalars(select(User))).all()
     return templates.TemplateResponse("users/index.html", {"request": request, "users": users})
 
 @user.get("/new")
-async def new(request: Request, current_user: User = Depends(get_current_active_user)):
+async def new(request: Request, current_user: CachedUser = Depends(get_current_active_user)):
     return templates.TemplateResponse("users/index.html", {"request": request})
 
 @user.post("/{user_id}/update")
-async def update(user_id: int, name: Annotated[str, Form()], email: Annotated[str, Form()], db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def update(user_id: int, name: Annotated[str, Form()], email: Annotated[str, Form()], db: AsyncSession = Depends(get_db), current_user: CachedUser = Depends(get_current_active_user)):
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user:
         user.name = name
         user.email = email
-        db.commit()
+        await db.commit()
+        user_cache.invalidate(user_id)
         return RedirectResponse(url=f"/users/{user_id}", status_code=status.HTTP_302_FOUND)
     else:
         raise HTTPException(status_code=404, detail="查無使用者")
 
 @user.get("/{user_id}")
-async def show(request: Request, user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def show(request: Request, user_id: int, db: AsyncSession = Depends(get_db), current_user: CachedUser = Depends(get_current_active_user)):
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user:
         return templates.TemplateResponse("users/show.html", {"request": request, "user": user})
     else:
         raise HTTPException(status_code=404, detail="查無使用者")
 
 @user.get("/{user_id}/edit")
-async def edit(request: Request, user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def edit(request: Request, user_id: int, db: AsyncSession = Depends(get_db), current_user: CachedUser = Depends(get_current_active_user)):
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user:
         return templates.TemplateResponse("users/edit.html", {"request": request, "user": user})
     else:
         raise HTTPException(status_code=404, detail="查無使用者")
 
 @user.post("/{user_id}/delete")
-async def delete(request: Request, user_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
-    user = db.query(User).filter(User.id == user_id).first()
+async def delete(request: Request, user_id: int, db: AsyncSession = Depends(get_db), current_user: CachedUser = Depends(get_current_active_user)):
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user:
-        db.delete(user)
-        db.commit()
-        return RedirectResponse(url="/users", status_code=status.HTTP_302_FOUND)
\ No newline at end of file
+        await db.delete(user)
+        await db.commit()
+        user_cache.invalidate(user_id)
+        return RedirectResponse(url="/users", status_code=status.HTTP_302_FOUND)
+
+@user.post("/{user_id}/deactivate")
+async def deactivate(request: Request, user_id: int, db: AsyncSession = Depends(get_db), current_user: CachedUser = Depends(get_current_active_user)):
+    user = await db.scalar(select(User).where(User.id == user_id))
+    if user:
+        user.is_active = False
+        await db.commit()
+        user_cache.invalidate(user_id)
+        return RedirectResponse(url=f"/users/{user_id}", status_code=status.HTTP_302_FOUND)
+    else:
+        raise HTTPException(status_code=404, detail="查無使用者")
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""同時連線下的事件迴圈阻塞測試。
+
+對執行中的伺服器同時送出大量看板請求，並另外以固定間隔探測一個不需查詢資料庫的頁面。
+同步的資料庫呼叫會卡住事件迴圈，探測頁面的延遲就會跟著看板查詢一起上升；
+改用 AsyncSession 後探測延遲應維持平穩。切換到舊版本再執行一次即可比較。
+
+    python -m benchmarks.concurrency --base-url http://localhost:8000 \\
+        --email user@example.com --password secret --path "/lanes?project_id=1"
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+def percentile(values, pct: float):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def summary(name: str, latencies, elapsed: float):
+    ms = [value * 1000 for value in latencies]
+    print(
+        f"{name:<28} n={len(ms):>5}  rps={len(ms) / elapsed:8.1f}  "
+        f"p50={percentile(ms, 50):7.1f}ms  p95={percentile(ms, 95):7.1f}ms  "
+        f"p99={percentile(ms, 99):7.1f}ms  max={max(ms, default=0):7.1f}ms  "
+        f"mean={statistics.fmean(ms) if ms else 0:7.1f}ms"
+    )
+
+async def login(client: httpx.AsyncClient, email: str, password: str):
+    response = await client.post("/users/login", data={"username": email, "password": password})
+    if response.status_code != 302 or "access_token" not in response.cookies:
+        raise SystemExit(f"登入失敗: {response.status_code}")
+
+async def worker(client: httpx.AsyncClient, path: str, remaining: list, latencies: list):
+    while remaining:
+        remaining.pop()
+        started = time.perf_counter()
+        response = await client.get(path, headers={"HX-Request": "true"})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event, latencies: list, interval: float):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        await login(client, args.email, args.password)
+        for path in args.path:
+            remaining = list(range(args.requests))
+            latencies, probe_latencies = [], []
+            stop = asyncio.Event()
+            probe_task = asyncio.create_task(probe(client, args.probe_path, stop, probe_latencies, args.probe_interval))
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(client, path, remaining, latencies) for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await probe_task
+            summary(path, latencies, elapsed)
+            summary(f"  probe {args.probe_path}", probe_latencies, elapsed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="同時連線負載測試")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--path", action="append", default=None, help="要測試的路徑，可重複指定")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--probe-path", default="/users/login")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    args = parser.parse_args()
+    args.path = args.path or ["/lanes?project_id=1"]
+    asyncio.run(run(args))
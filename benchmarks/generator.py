@@ -0,0 +1,79 @@
+"""合成看板資料產生器。
+
+依指定規模建立使用者、專案、泳道與任務，並將登入資訊與部分 id 寫入 manifest，
+供 benchmarks.load 使用。任務以多筆 INSERT 批次寫入，--tasks 為每個泳道的任務數：
+
+    python -m benchmarks.generator --users 10 --projects 2 --lanes 50 --tasks 5000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from sqlalchemy import insert, select
+from database.db import SessionLocal, engine
+from models.user import User
+from models.project import Project
+from models.user_project import UserProject
+from models.lane import Lane
+from models.task import Task
+from utils.auth import get_password_hash
+from utils.counters import reconcile_counters
+from utils.position import POSITION_GAP
+
+BATCH_SIZE = 5000
+SAMPLE_SIZE = 1000
+
+async def generate(args):
+    run_id = time.strftime("%Y%m%d%H%M%S")
+    password_hash = await get_password_hash(args.password)
+    async with SessionLocal() as db:
+        emails = [f"{args.prefix}-{run_id}-{n}@example.invalid" for n in range(1, args.users + 1)]
+        user_ids = (await db.scalars(insert(User).returning(User.id), [{"name": email.split("@")[0], "email": email, "password": password_hash, "is_active": True} for email in emails])).all()
+        project_ids = (await db.scalars(insert(Project).returning(Project.id), [{"name": f"{args.prefix}-{run_id}-{n}", "owner_id": user_ids[0]} for n in range(1, args.projects + 1)])).all()
+        await db.execute(insert(UserProject), [{"user_id": user_id, "project_id": project_id} for user_id in user_ids for project_id in project_ids])
+        projects = []
+        for project_id in project_ids:
+            lane_rows = [{"name": f"lane-{n}", "project_id": project_id, "position": n * POSITION_GAP} for n in range(1, args.lanes + 1)]
+            lane_ids = (await db.scalars(insert(Lane).returning(Lane.id), lane_rows)).all()
+            projects.append({"id": project_id, "lanes": list(lane_ids)})
+            batch = []
+            for lane_id in lane_ids:
+                for n in range(1, args.tasks + 1):
+                    batch.append({"name": f"task-{n}", "lane_id": lane_id, "position": n * POSITION_GAP})
+                    if len(batch) >= BATCH_SIZE:
+                        await db.execute(insert(Task), batch)
+                        batch = []
+            if batch:
+                await db.execute(insert(Task), batch)
+            # 任務直接批次寫入，看板計數需另外重新計算
+            await reconcile_counters(db, [project_id])
+            await db.commit()
+            print(f"project {project_id}: {args.lanes} lanes, {args.lanes * args.tasks} tasks")
+        # 取樣部分任務供拖拉測試使用
+        sample = (await db.execute(select(Task.id, Task.lane_id).join(Task.lane).where(Lane.project_id.in_(project_ids)).order_by(Task.id).limit(SAMPLE_SIZE * 10))).all()
+        sample = random.sample(sample, min(SAMPLE_SIZE, len(sample)))
+    await engine.dispose()
+    manifest = {
+        "run_id": run_id,
+        "email": emails[0],
+        "password": args.password,
+        "users": emails,
+        "projects": projects,
+        "tasks_per_lane": args.tasks,
+        "sample_tasks": [[task_id, lane_id] for task_id, lane_id in sample],
+    }
+    with open(args.manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"manifest written to {args.manifest}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="合成看板資料產生器")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--projects", type=int, default=1)
+    parser.add_argument("--lanes", type=int, default=10)
+    parser.add_argument("--tasks", type=int, default=100, help="每個泳道的任務數")
+    parser.add_argument("--password", default="bench-password")
+    parser.add_argument("--prefix", default="bench")
+    parser.add_argument("--manifest", default="bench_manifest.json")
+    asyncio.run(generate(parser.parse_args()))
@@ -0,0 +1,201 @@
+"""熱門端點的負載測試：看板、304 看板、泳道任務分頁、任務拖拉、新增任務與登入。
+
+預設在同一行程內以 ASGI 直接呼叫應用程式，可同時統計每個請求的 SQL 數量；
+指定 --base-url 時改對執行中的伺服器送出 HTTP 請求，並可用 --processes 分散到多個行程。
+結果（p50/p95/p99、吞吐量、查詢數）寫入 JSON，方便比較不同版本：
+
+    python -m benchmarks.generator --lanes 50 --tasks 5000
+    python -m benchmarks.load --manifest bench_manifest.json --output results.json
+    python -m benchmarks.load --base-url http://localhost:8000 --processes 4 --concurrency 64
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import subprocess
+import time
+import httpx
+from benchmarks.concurrency import percentile
+
+SCENARIOS = ["board", "board_304", "lane_tasks", "task_drag", "task_create", "login"]
+HX = {"HX-Request": "true"}
+# 預設只有 2xx 算成功；重新導向不會被跟隨，網址寫錯時會被記為錯誤而不是當作一次成功的載入
+EXPECTED_STATUS = {"board_304": {304}, "login": {302}}
+
+def is_expected(name: str, status_code: int):
+    expected = EXPECTED_STATUS.get(name)
+    return status_code in expected if expected else 200 <= status_code < 300
+
+def build_requests(manifest: dict):
+    project = manifest["projects"][0]
+    board_path = f"/lanes/?project_id={project['id']}"
+    sample = manifest["sample_tasks"]
+
+    def board(i, state):
+        return "GET", board_path, {"headers": HX}
+
+    def board_304(i, state):
+        return "GET", board_path, {"headers": {**HX, "If-None-Match": state.get("etag", "")}}
+
+    def lane_tasks(i, state):
+        # 看板上的泳道捲動到可見範圍時載入第一頁任務
+        lane_id = random.choice(project["lanes"])
+        return "GET", f"/tasks/?lane_id={lane_id}", {"headers": {**HX, "HX-Target": f"task-page-{lane_id}"}}
+
+    def task_drag(i, state):
+        task_id, lane_id = random.choice(sample)
+        return "PATCH", f"/tasks/{task_id}/position", {"data": {"new_index": random.randint(1, manifest["tasks_per_lane"]), "target_lane_id": lane_id}}
+
+    def task_create(i, state):
+        return "POST", "/tasks/", {"data": {"name": f"bench-{os.getpid()}-{i}-{time.time_ns()}", "lane_id": random.choice(project["lanes"])}, "headers": HX}
+
+    def login(i, state):
+        return "POST", "/users/login", {"data": {"username": manifest["email"], "password": manifest["password"]}}
+
+    return {"board": board, "board_304": board_304, "lane_tasks": lane_tasks, "task_drag": task_drag, "task_create": task_create, "login": login}, board_path
+
+async def login_client(client: httpx.AsyncClient, manifest: dict):
+    response = await client.post("/users/login", data={"username": manifest["email"], "password": manifest["password"]})
+    if response.status_code != 302 or "access_token" not in response.cookies:
+        raise SystemExit(f"登入失敗: {response.status_code}")
+
+async def run_phase(client: httpx.AsyncClient, name: str, make_request, requests: int, concurrency: int, state: dict):
+    """以 concurrency 個 worker 送出 requests 個請求，回傳 (延遲秒數, 錯誤數, 傳輸位元組數)。"""
+    counter = iter(range(requests))
+    latencies, errors, transferred = [], [0], [0]
+
+    async def worker():
+        for i in counter:
+            method, url, kwargs = make_request(i, state)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started)
+            transferred[0] += response.num_bytes_downloaded
+            if not is_expected(name, response.status_code):
+                errors[0] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors[0], transferred[0]
+
+async def prepare_state(client: httpx.AsyncClient, board_path: str):
+    response = await client.get(board_path, headers=HX)
+    if response.status_code != 200:
+        raise SystemExit(f"看板載入失敗: {board_path} {response.status_code}")
+    return {"etag": response.headers.get("ETag", "")}
+
+def summarize(latencies, elapsed: float, errors: int, transferred: int, queries=None):
+    ms = [value * 1000 for value in latencies]
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "rps": round(len(ms) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(percentile(ms, 50), 2),
+        "p95_ms": round(percentile(ms, 95), 2),
+        "p99_ms": round(percentile(ms, 99), 2),
+        "max_ms": round(max(ms, default=0), 2),
+        "mean_ms": round(statistics.fmean(ms), 2) if ms else 0,
+        "bytes_per_request": round(transferred / len(ms)) if ms else 0,
+        "queries_per_request": round(queries / len(ms), 2) if queries is not None and ms else None,
+    }
+
+async def run_asgi(manifest: dict, scenarios, requests: int, concurrency: int, headers: dict = None):
+    """在同一行程內測試，並以 SQLAlchemy 事件統計每個階段的 SQL 數量。"""
+    from sqlalchemy import event
+    from database.db import engine
+    from main import app
+
+    queries = [0]
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        queries[0] += 1
+
+    makers, board_path = build_requests(manifest)
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=headers, timeout=120, follow_redirects=False) as client:
+        await login_client(client, manifest)
+        event.listen(engine.sync_engine, "before_cursor_execute", count)
+        try:
+            for name in scenarios:
+                state = await prepare_state(client, board_path)
+                queries[0] = 0
+                started = time.perf_counter()
+                latencies, errors, transferred = await run_phase(client, name, makers[name], requests, concurrency, state)
+                results[name] = summarize(latencies, time.perf_counter() - started, errors, transferred, queries[0])
+                print(f"{name:<12} {results[name]}")
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", count)
+    await engine.dispose()
+    return results
+
+async def http_phase(base_url: str, manifest: dict, name: str, requests: int, concurrency: int, headers: dict = None):
+    makers, board_path = build_requests(manifest)
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, headers=headers, timeout=120, follow_redirects=False) as client:
+        await login_client(client, manifest)
+        state = await prepare_state(client, board_path)
+        return await run_phase(client, name, makers[name], requests, concurrency, state)
+
+def http_worker(job):
+    return asyncio.run(http_phase(*job))
+
+def run_http(base_url: str, manifest: dict, scenarios, requests: int, concurrency: int, processes: int, headers: dict = None):
+    """對執行中的伺服器測試，每個階段平均分配給多個行程。"""
+    results = {}
+    with multiprocessing.Pool(processes) as pool:
+        for name in scenarios:
+            jobs = [(base_url, manifest, name, requests // processes, max(concurrency // processes, 1), headers) for _ in range(processes)]
+            started = time.perf_counter()
+            outputs = pool.map(http_worker, jobs)
+            elapsed = time.perf_counter() - started
+            latencies = [value for output in outputs for value in output[0]]
+            results[name] = summarize(latencies, elapsed, sum(output[1] for output in outputs), sum(output[2] for output in outputs))
+            print(f"{name:<12} {results[name]}")
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="熱門端點負載測試")
+    parser.add_argument("--manifest", default="bench_manifest.json")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="要執行的情境，可重複指定，預設全部")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--base-url", help="指定時改對執行中的伺服器送出 HTTP 請求")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--accept-encoding", help="覆寫 Accept-Encoding，例如 identity 可量測未壓縮的大小")
+    args = parser.parse_args()
+    with open(args.manifest, encoding="utf-8") as f:
+        manifest = json.load(f)
+    scenarios = args.scenario or SCENARIOS
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    headers = {"Accept-Encoding": args.accept_encoding} if args.accept_encoding else None
+    if args.base_url:
+        results = run_http(args.base_url, manifest, scenarios, args.requests, args.concurrency, args.processes, headers)
+    else:
+        results = asyncio.run(run_asgi(manifest, scenarios, args.requests, args.concurrency, headers))
+    output = {
+        "meta": {
+            "started_at": started_at,
+            "revision": git_revision(),
+            "mode": "http" if args.base_url else "asgi",
+            "base_url": args.base_url,
+            "processes": args.processes if args.base_url else 1,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "accept_encoding": args.accept_encoding,
+            "manifest": manifest["run_id"],
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(output, f, ensure_ascii=False, indent=2)
+    print(f"results written to {args.output}")
@@ -0,0 +1,64 @@
+"""任務拖拉排序的基準測試。
+
+在不同大小的泳道中重複移動任務，記錄每次移動的耗時與 UPDATE 筆數，
+用來確認移動成本不會隨泳道大小成長。
+
+    python -m benchmarks.task_move --sizes 100 1000 5000 --moves 200
+"""
+import argparse
+import asyncio
+import random
+import time
+from fastapi import BackgroundTasks
+from sqlalchemy import delete, event, insert, select
+from database.db import SessionLocal, engine
+from models.project import Project
+from models.lane import Lane
+from models.task import Task
+from utils.position import POSITION_GAP, move_to_index
+
+async def seed_lane(db, size: int):
+    project = Project(name=f"bench-move-{size}-{time.time_ns()}")
+    db.add(project)
+    await db.flush()
+    lane = Lane(name="bench", project_id=project.id, position=POSITION_GAP)
+    db.add(lane)
+    await db.flush()
+    await db.execute(insert(Task), [{"name": f"task-{i}", "lane_id": lane.id, "position": i * POSITION_GAP} for i in range(1, size + 1)])
+    await db.commit()
+    return project, lane
+
+async def run(sizes, moves: int):
+    counter = {"updates": 0}
+
+    def count_updates(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            counter["updates"] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count_updates)
+    try:
+        async with SessionLocal() as db:
+            for size in sizes:
+                project, lane = await seed_lane(db, size)
+                task_ids = (await db.scalars(select(Task.id).where(Task.lane_id == lane.id))).all()
+                counter["updates"] = 0
+                started = time.perf_counter()
+                for _ in range(moves):
+                    task_obj = await db.get(Task, random.choice(task_ids))
+                    await move_to_index(db, task_obj, Task.lane_id, lane.id, random.randint(1, size), BackgroundTasks())
+                    await db.commit()
+                elapsed = time.perf_counter() - started
+                print(f"lane size {size:>6}: {elapsed / moves * 1000:8.2f} ms/move, {counter['updates'] / moves:6.2f} UPDATE/move")
+                await db.execute(delete(Task).where(Task.lane_id == lane.id))
+                await db.delete(lane)
+                await db.delete(project)
+                await db.commit()
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", count_updates)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="任務移動成本基準測試")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 2000, 5000])
+    parser.add_argument("--moves", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, args.moves))
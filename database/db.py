@@ -1,22 +1,47 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from database.pool import TimedQueuePool
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv(override=True)
+logger = logging.getLogger(__name__)
 
 db_name = os.getenv('DB_NAME')
 if not db_name:
     raise ValueError("DB_NAME not found in environment variables")
 
+# Alembic 遷移仍使用同步的 psycopg2 連線
 DATABASE_URL = (
     f"postgresql+psycopg2://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
     f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{db_name}"
 )
+# 應用程式使用 asyncpg，查詢時不會阻塞事件迴圈
+ASYNC_DATABASE_URL = (
+    f"postgresql+asyncpg://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
+    f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{db_name}"
+)
 
-print(f"使用的資料庫名稱: {db_name}")
+# 連線池設定，依 worker 數量調整
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
\ No newline at end of file
+logger.info("使用的資料庫名稱: %s", db_name)
+
+engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    poolclass=TimedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    # Postgres 重啟後先檢查連線，避免拿到失效的連線
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+# 提交後不讓物件過期，避免在 async 環境中觸發隱式的延遲載入
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+Base = declarative_base()
@@ -0,0 +1,77 @@
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+class PoolWaitStats:
+    """記錄取得連線時的等待時間與逾時次數。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.last_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.total_wait += wait
+                self.last_wait = wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "last_wait_ms": round(self.last_wait * 1000, 3),
+            }
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """會統計連線等待時間的連線池。"""
+
+    wait_stats = PoolWaitStats()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            # 只有等不到連線才算逾時，連線失敗等其他錯誤直接拋出，不計入統計
+            self.wait_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        self.wait_stats.record(time.perf_counter() - started)
+        return connection
+
+def pool_status(engine):
+    """回傳連線池目前的使用情況，設定值取自 database.db。"""
+    # database.db 匯入本模組的 TimedQueuePool，於此處匯入避免循環
+    from database.db import DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE
+
+    pool = engine.pool
+    status = {
+        "pool_class": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        # overflow() 在尚未用滿 pool_size 時為負值
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "timeout": pool.timeout(),
+        "recycle": DB_POOL_RECYCLE,
+        "pre_ping": DB_POOL_PRE_PING,
+    }
+    if isinstance(pool, TimedQueuePool):
+        status["wait"] = pool.wait_stats.snapshot()
+    return status
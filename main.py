@@ -1,38 +1,59 @@
 from fastapi import Depends, Query, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy import text
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Annotated, Literal
 from pydantic import BaseModel, Field
-from starlette.middleware.base import BaseHTTPMiddleware
+from utils.log import setup_logging
+
+# 先設定日誌，之後匯入的模組（含資料庫連線）才會經由佇列輸出
+setup_logging()
+
 from database.db import Base, engine
 from utils.get_db import get_db
-from app import app
+from app import app, templates
 from app.users.views import user as user_route
 from app.projects.views import project as project_route
 from app.lanes.views import lane as lane_routes
 from app.tasks.views import task as task_routes
-from fastapi.staticfiles import StaticFiles
-from middleware import auth_middleware
+from app.internal.views import internal as internal_routes
+from middleware import AuthMiddleware, CompressionMiddleware, RequestIdMiddleware, ServerTimingMiddleware
+from utils.timing import instrument_engine, instrument_templates
+from utils.templating import compile_templates, prerender_static_pages
+from utils.static_assets import static_assets
 from fastapi.responses import RedirectResponse
 
-app.add_middleware(BaseHTTPMiddleware, dispatch=auth_middleware)
+# 壓縮在最內層，計時包含壓縮耗時
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(AuthMiddleware)
+# 最後加入的中介層在最外層：關聯 id 最先設定，計時涵蓋驗證與整個請求
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(RequestIdMiddleware)
+instrument_engine(engine)
+instrument_templates(templates)
+# 靜態檔案加上內容雜湊並預先壓縮，模板以 static_url() 取得帶雜湊的網址
+static_assets.build()
+templates.env.globals["static_url"] = static_assets.url
+# 計時用的模板類別設定後才預先編譯，每個 worker 匯入時即完成
+compile_templates(templates)
+prerender_static_pages(templates)
 
 app.include_router(user_route, prefix="/users")
 app.include_router(project_route, prefix="/projects")
 app.include_router(lane_routes, prefix="/lanes")
 app.include_router(task_routes, prefix="/tasks")
+app.include_router(internal_routes, prefix="/internal")
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", static_assets, name="static")
 
 @app.get("/")
 def index():
     return RedirectResponse(url="/users/login")
 
 @app.get("/test-db")
-def test_db_connection(db: Session = Depends(get_db)):
+async def test_db_connection(db: AsyncSession = Depends(get_db)):
     try:
-        db.execute(text("SELECT 1")).fetchone()
+        (await db.execute(text("SELECT 1"))).fetchone()
         return {"message": "success"}
     except Exception as e:
         return {"message": "error", "e": e}
@@ -1,32 +1,194 @@
-from fastapi import Request, HTTPException, status
+from fastapi import status
 from fastapi.responses import RedirectResponse
 from jose import JWTError, jwt
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import HTTPConnection
 from utils.auth import SECRET_KEY, ALGORITHM
+from utils.compression import COMPRESSION_MIN_SIZE, COMPRESSORS, EXCLUDED_PATHS, choose_encoding, compress_body, is_compressible
+from utils.log import request_id
+from utils.static_assets import accepted_encodings
+from utils.timing import RequestTiming, current_timing, server_timing_header, SERVER_TIMING, SLOW_REQUEST_MS
+import logging
 import re
+import uuid
 
-# 不需要身份驗證的路徑
+request_logger = logging.getLogger("request")
+# 外部傳入的關聯 id 只接受短的英數字串，避免污染日誌
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# 不需要身份驗證的路徑，合併為單一正規表示式，每個請求只比對一次
 PUBLIC_PATHS = [
-    re.compile(r"^/$"),
-    re.compile(r"^/users/login/?$"),
-    re.compile(r"^/users/register/?$"),
-    re.compile(r"^/static/.*$"),
+    r"/",
+    r"/users/login/?",
+    r"/users/register/?",
+    r"/static/.*",
 ]
+PUBLIC_PATH_PATTERN = re.compile("^(?:" + "|".join(PUBLIC_PATHS) + ")$")
+# 未登入時的導向回應不含請求相關內容，可重複使用
+LOGIN_REDIRECT = RedirectResponse(url="/users/login", status_code=status.HTTP_302_FOUND)
+
+class AuthMiddleware:
+    """以純 ASGI 實作的 Cookie 驗證，不包裝回應串流，SSE 等串流回應可直接通過。
+
+    驗證失敗時導向登入頁；成功時將解析結果放入 request.state.token_payload，
+    交給後續的 get_current_user 使用，同一請求只解析一次。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or PUBLIC_PATH_PATTERN.match(scope["path"]):
+            return await self.app(scope, receive, send)
+        # 檢查 Cookie 中的 access_token
+        access_token = HTTPConnection(scope).cookies.get("access_token")
+        if not access_token or not access_token.startswith("Bearer "):
+            return await LOGIN_REDIRECT(scope, receive, send)
+        try:
+            payload = jwt.decode(access_token[len("Bearer "):], SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return await LOGIN_REDIRECT(scope, receive, send)
+        scope.setdefault("state", {})["token_payload"] = payload
+        await self.app(scope, receive, send)
+
+class ServerTimingMiddleware:
+    """記錄每個請求的 SQL 次數與耗時、模板渲染耗時，輸出 Server-Timing 標頭與一行結構化日誌。
+
+    以純 ASGI 實作，不會像 BaseHTTPMiddleware 一樣緩衝回應；
+    Server-Timing 的數值為送出標頭當下的累計，日誌則在回應本體送完時取值。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        timing = RequestTiming()
+        token = current_timing.set(timing)
+        result = {"status": None, "snapshot": None}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                result["status"] = message["status"]
+                if SERVER_TIMING:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", server_timing_header(timing.snapshot()))
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                result["snapshot"] = timing.snapshot()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timing.reset(token)
+            snapshot = result["snapshot"] or timing.snapshot()
+            route = scope.get("route")
+            entry = {
+                "method": scope["method"],
+                "route": getattr(route, "path", scope["path"]),
+                "path": scope["path"],
+                "status": result["status"] or 500,
+                **snapshot,
+            }
+            level = logging.WARNING if entry["status"] >= 500 else logging.INFO
+            if snapshot["total_ms"] >= SLOW_REQUEST_MS:
+                level = logging.WARNING
+                entry["slow"] = True
+                entry["statements"] = [{"sql": statement, "ms": round(elapsed * 1000, 2)} for statement, elapsed in timing.statements]
+            request_logger.log(level, "request", extra={"fields": entry})
+
+class RequestIdMiddleware:
+    """為每個請求設定關聯 id，沿用合法的 X-Request-ID 標頭或自行產生，並回傳於回應標頭。"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        incoming = Headers(scope=scope).get("x-request-id", "")
+        current = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        token = request_id.set(current)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-ID", current)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id.reset(token)
+
+
+def set_encoding_headers(headers: MutableHeaders, encoding: str = None):
+    headers.add_vary_header("Accept-Encoding")
+    if encoding is None:
+        return
+    headers["Content-Encoding"] = encoding
+    # 壓縮後位元組不同，強 ETag 改為弱 ETag
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+class CompressionMiddleware:
+    """依 Accept-Encoding 以 br、zstd 或 gzip 壓縮 HTML 等文字回應。
+
+    單次送出的回應小於 COMPRESSION_MIN_SIZE 時不壓縮，帶 ETag 的回應重用快取的壓縮結果；串流回應逐段壓縮並 flush，
+    不會等到整個回應結束才送出。已有 Content-Encoding 的回應（如預先壓縮的靜態檔案）、
+    拖拉排序的 JSON 回覆與 SSE 直接通過。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or EXCLUDED_PATHS.match(scope["path"]):
+            return await self.app(scope, receive, send)
+        encoding = choose_encoding(accepted_encodings(Headers(scope=scope).get("accept-encoding", "")))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        state = {"start": None, "compressor": None, "passthrough": False}
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if "content-encoding" in headers or message["status"] in (204, 304) or not is_compressible(headers.get("content-type", "")):
+                    state["passthrough"] = True
+                    return await send(message)
+                # 等到第一段本體才能判斷大小與是否為串流
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["passthrough"]:
+                return await send(message)
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            start = state["start"]
+            if start is not None:
+                state["start"] = None
+                headers = MutableHeaders(scope=start)
+                if not more_body:
+                    state["passthrough"] = True
+                    if len(body) < COMPRESSION_MIN_SIZE:
+                        set_encoding_headers(headers)
+                        await send(start)
+                        return await send(message)
+                    # ETag 相同代表內容相同（同一 ETag 本來就會回 304），可重用先前的壓縮結果
+                    etag = headers.get("etag")
+                    cache_key = (scope["path"], scope.get("query_string", b""), etag) if etag else None
+                    body = await compress_body(encoding, body, cache_key)
+                    set_encoding_headers(headers, encoding)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start)
+                    return await send({"type": "http.response.body", "body": body})
+                set_encoding_headers(headers, encoding)
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                state["compressor"] = COMPRESSORS[encoding]()
+                await send(start)
+            compressor = state["compressor"]
+            data = compressor.compress(body) + (compressor.flush() if more_body else compressor.finish())
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
 
-async def auth_middleware(request: Request, call_next):
-    # 檢查是否為公開路徑
-    path = request.url.path
-    if any(pattern.match(path) for pattern in PUBLIC_PATHS):
-        return await call_next(request)
-    # 檢查 Cookie 中的 access_token
-    access_token = request.cookies.get("access_token")
-    if not access_token or not access_token.startswith("Bearer "):
-        print("No valid token found in cookie, redirecting to login")
-        return RedirectResponse(url="/users/login", status_code=status.HTTP_302_FOUND)
-    token = access_token.replace("Bearer ", "")
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(f"Token decoded successfully: sub={payload.get('sub')}")
-    except JWTError as e:
-        print(f"Token decode error: {str(e)}")
-        return RedirectResponse(url="/users/login", status_code=status.HTTP_302_FOUND)
-    return await call_next(request)
\ No newline at end of file
+        await self.app(scope, receive, send_compressed)
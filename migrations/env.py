@@ -16,6 +16,7 @@ from models.project import Project
 from models.user_project import UserProject
 from models.lane import Lane
 from models.task import Task
+from models.board_counter import BoardCounter
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -0,0 +1,33 @@
+"""add task search indexes
+
+Revision ID: 1e81b53aa50e
+Revises: aac5c4f80fc8
+Create Date: 2026-10-18 15:20:48.730615
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1e81b53aa50e'
+down_revision: Union[str, None] = 'aac5c4f80fc8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # 使用 simple 設定：中文不做詞幹處理，子字串比對交給 trigram 索引
+    op.add_column('tasks', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed("to_tsvector('simple', coalesce(name, ''))", persisted=True), nullable=True))
+    op.create_index('ix_tasks_search_vector', 'tasks', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_tasks_name_trgm', 'tasks', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tasks_name_trgm', table_name='tasks', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.drop_index('ix_tasks_search_vector', table_name='tasks', postgresql_using='gin')
+    op.drop_column('tasks', 'search_vector')
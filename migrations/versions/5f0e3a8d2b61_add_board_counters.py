@@ -0,0 +1,42 @@
+"""add board counters
+
+Revision ID: 5f0e3a8d2b61
+Revises: c7d2e94b1f30
+Create Date: 2026-10-18 17:02:45.381920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f0e3a8d2b61'
+down_revision: Union[str, None] = 'c7d2e94b1f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('board_counters',
+    sa.Column('project_id', sa.Integer(), nullable=False),
+    sa.Column('dimension', sa.String(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['project_id'], ['projects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('project_id', 'dimension', 'key')
+    )
+    # 以現有任務建立初始計數
+    op.execute("""
+        INSERT INTO board_counters (project_id, dimension, key, count)
+        SELECT lanes.project_id, 'lane', tasks.lane_id::text, count(*) FROM tasks JOIN lanes ON lanes.id = tasks.lane_id WHERE lanes.project_id IS NOT NULL GROUP BY lanes.project_id, tasks.lane_id
+        UNION ALL
+        SELECT lanes.project_id, 'user', coalesce(tasks.user_id::text, ''), count(*) FROM tasks JOIN lanes ON lanes.id = tasks.lane_id WHERE lanes.project_id IS NOT NULL GROUP BY lanes.project_id, coalesce(tasks.user_id::text, '')
+        UNION ALL
+        SELECT lanes.project_id, 'status', coalesce(tasks.status, ''), count(*) FROM tasks JOIN lanes ON lanes.id = tasks.lane_id WHERE lanes.project_id IS NOT NULL GROUP BY lanes.project_id, coalesce(tasks.status, '')
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('board_counters')
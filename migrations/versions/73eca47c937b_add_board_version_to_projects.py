@@ -0,0 +1,26 @@
+"""add board_version to projects
+
+Revision ID: 73eca47c937b
+Revises: 432e086d8e0f
+Create Date: 2026-10-18 10:12:41.208133
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '73eca47c937b'
+down_revision: Union[str, None] = '432e086d8e0f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('projects', sa.Column('board_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('projects', 'board_version')
@@ -0,0 +1,37 @@
+"""make task position not null
+
+Revision ID: 9b4d1c7e3a52
+Revises: 5f0e3a8d2b61
+Create Date: 2026-10-18 17:20:12.604318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b4d1c7e3a52'
+down_revision: Union[str, None] = '5f0e3a8d2b61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # 尚無排序值的舊任務依 id 接在同泳道現有任務之後，間距與 POSITION_GAP 相同
+    op.execute("""
+        UPDATE tasks SET position = ranked.position
+        FROM (
+            SELECT tasks.id, coalesce(lane_max.position, 0) + row_number() OVER (PARTITION BY tasks.lane_id ORDER BY tasks.id) * 1024 AS position
+            FROM tasks
+            LEFT JOIN (SELECT lane_id, max(position) AS position FROM tasks GROUP BY lane_id) AS lane_max ON lane_max.lane_id IS NOT DISTINCT FROM tasks.lane_id
+            WHERE tasks.position IS NULL
+        ) AS ranked
+        WHERE tasks.id = ranked.id
+    """)
+    op.alter_column('tasks', 'position', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade() -> None:
+    op.alter_column('tasks', 'position', existing_type=sa.Integer(), nullable=True)
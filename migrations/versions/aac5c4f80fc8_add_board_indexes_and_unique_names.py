@@ -0,0 +1,65 @@
+"""add board indexes and unique names
+
+Revision ID: aac5c4f80fc8
+Revises: 73eca47c937b
+Create Date: 2026-10-18 14:03:27.551904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'aac5c4f80fc8'
+down_revision: Union[str, None] = '73eca47c937b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def dedupe_names(table: str, scope: str) -> None:
+    """將同一群組內重複的名稱改為「名稱 (n)」，保留最早建立的一筆。
+
+    n 從該筆在重複名稱中的排名開始，遇到群組內已存在的名稱時遞增，改名後不會產生新的重複。
+    """
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(f"""
+        SELECT id, scope_id, name, rn FROM (
+            SELECT id, {scope} AS scope_id, name, row_number() OVER (PARTITION BY {scope}, name ORDER BY id) AS rn
+            FROM {table} WHERE {scope} IS NOT NULL
+        ) AS ranked
+        WHERE rn > 1
+        ORDER BY scope_id, name, rn
+    """)).all()
+    if not duplicates:
+        return
+    scope_ids = sorted({row.scope_id for row in duplicates})
+    taken = set(bind.execute(sa.text(f"SELECT {scope}, name FROM {table} WHERE {scope} IN :scope_ids").bindparams(sa.bindparam("scope_ids", expanding=True)), {"scope_ids": scope_ids}).all())
+    for row in duplicates:
+        suffix = row.rn
+        while (row.scope_id, f"{row.name} ({suffix})") in taken:
+            suffix += 1
+        name = f"{row.name} ({suffix})"
+        taken.add((row.scope_id, name))
+        bind.execute(sa.text(f"UPDATE {table} SET name = :name WHERE id = :id"), {"name": name, "id": row.id})
+
+
+def upgrade() -> None:
+    # 加上唯一約束前，先將同一泳道／專案內重複的名稱改名
+    dedupe_names('tasks', 'lane_id')
+    dedupe_names('lanes', 'project_id')
+    op.create_index('ix_tasks_lane_id_position', 'tasks', ['lane_id', 'position'], unique=False)
+    op.create_index('ix_lanes_project_id_position', 'lanes', ['project_id', 'position'], unique=False)
+    # 主鍵 (user_id, project_id) 已涵蓋以 user_id 查詢，另補以 project_id 開頭的索引
+    op.create_index('ix_user_projects_project_id_user_id', 'user_projects', ['project_id', 'user_id'], unique=False)
+    op.create_unique_constraint('uq_tasks_lane_id_name', 'tasks', ['lane_id', 'name'])
+    op.create_unique_constraint('uq_lanes_project_id_name', 'lanes', ['project_id', 'name'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_lanes_project_id_name', 'lanes', type_='unique')
+    op.drop_constraint('uq_tasks_lane_id_name', 'tasks', type_='unique')
+    op.drop_index('ix_user_projects_project_id_user_id', table_name='user_projects')
+    op.drop_index('ix_lanes_project_id_position', table_name='lanes')
+    op.drop_index('ix_tasks_lane_id_position', table_name='tasks')
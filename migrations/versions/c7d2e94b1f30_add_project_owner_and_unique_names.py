@@ -0,0 +1,66 @@
+"""add project owner and unique names
+
+Revision ID: c7d2e94b1f30
+Revises: 1e81b53aa50e
+Create Date: 2026-10-18 16:41:09.214587
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e94b1f30'
+down_revision: Union[str, None] = '1e81b53aa50e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# 與 aac5c4f80fc8 相同；遷移檔各自獨立，不互相匯入
+def dedupe_names(table: str, scope: str) -> None:
+    """將同一群組內重複的名稱改為「名稱 (n)」，保留最早建立的一筆。
+
+    n 從該筆在重複名稱中的排名開始，遇到群組內已存在的名稱時遞增，改名後不會產生新的重複。
+    """
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(f"""
+        SELECT id, scope_id, name, rn FROM (
+            SELECT id, {scope} AS scope_id, name, row_number() OVER (PARTITION BY {scope}, name ORDER BY id) AS rn
+            FROM {table} WHERE {scope} IS NOT NULL
+        ) AS ranked
+        WHERE rn > 1
+        ORDER BY scope_id, name, rn
+    """)).all()
+    if not duplicates:
+        return
+    scope_ids = sorted({row.scope_id for row in duplicates})
+    taken = set(bind.execute(sa.text(f"SELECT {scope}, name FROM {table} WHERE {scope} IN :scope_ids").bindparams(sa.bindparam("scope_ids", expanding=True)), {"scope_ids": scope_ids}).all())
+    for row in duplicates:
+        suffix = row.rn
+        while (row.scope_id, f"{row.name} ({suffix})") in taken:
+            suffix += 1
+        name = f"{row.name} ({suffix})"
+        taken.add((row.scope_id, name))
+        bind.execute(sa.text(f"UPDATE {table} SET name = :name WHERE id = :id"), {"name": name, "id": row.id})
+
+
+def upgrade() -> None:
+    op.add_column('projects', sa.Column('owner_id', sa.Integer(), nullable=True))
+    op.create_foreign_key('fk_projects_owner_id_users', 'projects', 'users', ['owner_id'], ['id'])
+    # 既有專案以最早加入的成員作為擁有者
+    op.execute("""
+        UPDATE projects SET owner_id = owner.user_id
+        FROM (SELECT project_id, min(user_id) AS user_id FROM user_projects GROUP BY project_id) AS owner
+        WHERE projects.id = owner.project_id
+    """)
+    # 加上唯一約束前，先將同一擁有者重複的專案名稱改名
+    dedupe_names('projects', 'owner_id')
+    op.create_unique_constraint('uq_projects_owner_id_name', 'projects', ['owner_id', 'name'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_projects_owner_id_name', 'projects', type_='unique')
+    op.drop_constraint('fk_projects_owner_id_users', 'projects', type_='foreignkey')
+    op.drop_column('projects', 'owner_id')
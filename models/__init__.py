@@ -2,4 +2,5 @@ from .user import User
 from .project import Project
 from .user_project import UserProject
 from .lane import Lane
-from .task import Task
\ No newline at end of file
+from .task import Task
+from .board_counter import BoardCounter
@@ -0,0 +1,16 @@
+from database.db import Base
+from sqlalchemy import Column, Integer, String, ForeignKey
+
+class BoardCounter(Base):
+    """專案內任務數的反正規化計數，依泳道、負責人與狀態分組。
+
+    由任務的新增、刪除、移動等路徑在同一交易中增減，並定期以 reconcile_counters 校正。
+    主鍵以 project_id 開頭，查詢單一專案的摘要只需一次索引範圍掃描。
+    """
+    __tablename__ = "board_counters"
+
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), primary_key=True)
+    # lane、user、status；key 為泳道 id、使用者 id 或狀態字串，未指派與無狀態為空字串
+    dimension = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0, server_default="0")
@@ -1,9 +1,14 @@
 from database.db import Base
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 class Lane(Base):
     __tablename__ = "lanes"
+    __table_args__ = (
+        # 看板依專案讀取並排序泳道
+        Index("ix_lanes_project_id_position", "project_id", "position"),
+        UniqueConstraint("project_id", "name", name="uq_lanes_project_id_name"),
+    )
     id = Column(Integer, primary_key=True, nullable=False)
     name = Column(String, nullable=False)
     position = Column(Integer)
@@ -11,4 +16,4 @@ class Lane(Base):
     project_id = Column(Integer, ForeignKey("projects.id"))
     project = relationship("Project", back_populates="lanes")
 
-    tasks = relationship("Task", back_populates="lane")
\ No newline at end of file
+    tasks = relationship("Task", back_populates="lane", order_by="Task.position")
\ No newline at end of file
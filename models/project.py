@@ -1,18 +1,23 @@
 from database.db import Base
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import Column, ForeignKey, Integer, String, Text, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 class Project(Base):
     __tablename__ = "projects"
+    # 同一擁有者的專案名稱不可重複，也作為依名稱查詢的索引
+    __table_args__ = (UniqueConstraint("owner_id", "name", name="uq_projects_owner_id_name"),)
 
     id = Column(Integer, primary_key=True, nullable=False)
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
     start_date = Column(DateTime)
     end_date = Column(DateTime)
+    # 看板內容版本，泳道或任務有任何異動時遞增，用於 ETag 與快取
+    board_version = Column(Integer, nullable=False, default=0, server_default="0")
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True)
 
     user_associations = relationship("UserProject", back_populates="project")
-    lanes = relationship("Lane", back_populates="project")
+    lanes = relationship("Lane", back_populates="project", order_by="Lane.position")
 
     @property
     def users(self):
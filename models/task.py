@@ -1,9 +1,18 @@
 from database.db import Base
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Computed, Integer, String, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (
+        # 看板依泳道讀取並排序任務
+        Index("ix_tasks_lane_id_position", "lane_id", "position"),
+        UniqueConstraint("lane_id", "name", name="uq_tasks_lane_id_name"),
+        # 全文檢索與模糊比對（pg_trgm）
+        Index("ix_tasks_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_tasks_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -14,4 +23,6 @@ class Task(Base):
     priority = Column(String, nullable=True)
     status = Column(String, nullable=True)
     end_date = Column(DateTime)
-    position = Column(Integer)
+    position = Column(Integer, nullable=False)
+    # 由資料庫依名稱產生的 tsvector，一般查詢不會載入
+    search_vector = deferred(Column(TSVECTOR, Computed("to_tsvector('simple', coalesce(name, ''))", persisted=True)))
@@ -1,9 +1,11 @@
 from database.db import Base
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 
 class UserProject(Base):
     __tablename__ = "user_projects"
+    # 主鍵以 user_id 開頭，依專案查詢成員需要另一個索引
+    __table_args__ = (Index("ix_user_projects_project_id_user_id", "project_id", "user_id"),)
 
     user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
     project_id = Column(Integer, ForeignKey("projects.id"), primary_key=True)
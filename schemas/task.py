@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Literal, Optional
 
 class TaskCreate(BaseModel):
     name: str = Field(...)
@@ -7,4 +7,18 @@ class TaskCreate(BaseModel):
     lane_id: Optional[int] = None
 
 class TaskUpdate(BaseModel):
-    name: str = Field(...)
\ No newline at end of file
+    name: str = Field(...)
+
+class TaskBatchOperation(BaseModel):
+    op: Literal["move", "rename", "delete", "reassign"]
+    task_id: int
+    # move：目標泳道與位置（從 1 開始）
+    lane_id: Optional[int] = None
+    index: Optional[int] = Field(None, ge=1)
+    # rename：新名稱
+    name: Optional[str] = Field(None, min_length=1)
+    # reassign：負責人，None 表示取消指派
+    user_id: Optional[int] = None
+
+class TaskBatch(BaseModel):
+    operations: List[TaskBatchOperation] = Field(..., min_length=1, max_length=500)
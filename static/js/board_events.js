@@ -0,0 +1,200 @@
+// 看板即時更新：訂閱 /lanes/events，依事件只更新有變動的任務卡片或泳道
+const boardClientId = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : Math.random().toString(36).slice(2);
+let boardEventSource = null;
+let boardEventProjectId = null;
+
+// 每個請求都帶上分頁的識別碼，伺服器會放進事件的 origin，用來略過自己造成的事件
+document.addEventListener("htmx:configRequest", function (event) {
+    event.detail.headers["X-Client-Id"] = boardClientId;
+});
+
+document.addEventListener("DOMContentLoaded", function () {
+    connectBoardEvents();
+    document.body.addEventListener("htmx:afterSwap", connectBoardEvents);
+});
+
+// 泳道的任務逐頁載入，拖拉或即時事件先放上的卡片可能再次出現在之後的頁面中，保留最新放入的一張
+document.addEventListener("htmx:load", function (event) {
+    const element = event.detail.elt;
+    if (!element.classList || !element.classList.contains("task-item")) return;
+    document.querySelectorAll(`[id="${element.id}"]`).forEach(function (other) {
+        if (other !== element) {
+            other.remove();
+        }
+    });
+});
+
+// 自己新增或刪除任務後更新泳道的任務數（其他分頁的變更由事件處理）
+document.addEventListener("htmx:afterRequest", function (event) {
+    const path = event.detail.pathInfo ? event.detail.pathInfo.requestPath : "";
+    if (event.detail.successful && event.detail.requestConfig.verb === "post" && path.startsWith("/tasks")) {
+        refreshLaneCounts();
+    }
+});
+
+function connectBoardEvents() {
+    const container = document.getElementById("lanes-container");
+    const projectId = container ? container.dataset.projectId : "";
+    if (projectId === boardEventProjectId) return;
+    if (boardEventSource) {
+        boardEventSource.close();
+        boardEventSource = null;
+    }
+    boardEventProjectId = projectId;
+    if (!projectId) return;
+    let opened = false;
+    boardEventSource = new EventSource(`/lanes/events?project_id=${projectId}`);
+    boardEventSource.onopen = function () {
+        // 斷線期間可能錯過事件，重新連上後重新載入整個看板
+        if (opened) {
+            refreshBoard(projectId);
+        }
+        opened = true;
+    };
+    boardEventSource.onmessage = function (event) {
+        const data = JSON.parse(event.data);
+        if (data.origin && data.origin === boardClientId) return;
+        applyBoardEvent(projectId, data);
+    };
+}
+
+function applyBoardEvent(projectId, data) {
+    if (data.type.startsWith("task.")) {
+        refreshLaneCounts();
+    }
+    switch (data.type) {
+        case "task.created":
+            appendFragment(`task-list-${data.lane_id}`, `task-${data.task_id}`, `/tasks/${data.task_id}/card`);
+            break;
+        case "task.updated":
+            replaceFragment(`task-${data.task_id}`, `/tasks/${data.task_id}/card`);
+            break;
+        case "task.deleted":
+            removeBoardElement(`task-${data.task_id}`);
+            break;
+        case "task.moved":
+            if (!moveBoardElement(`task-${data.task_id}`, `task-list-${data.lane_id}`, ":scope > .task-item", data.index)) {
+                // 任務所在的頁面尚未載入
+                placeTaskCard(data.task_id, data.lane_id, data.index);
+            }
+            break;
+        case "lane.created":
+            appendFragment("lanes-container", `lane-${data.lane_id}`, `/lanes/${data.lane_id}/fragment`);
+            break;
+        case "lane.updated":
+            replaceFragment(`lane-${data.lane_id}`, `/lanes/${data.lane_id}/fragment`);
+            break;
+        case "lane.deleted":
+            removeBoardElement(`lane-${data.lane_id}`);
+            break;
+        case "lane.moved":
+            if (!moveBoardElement(`lane-${data.lane_id}`, "lanes-container", ":scope > [data-id]", data.index)) {
+                refreshBoard(projectId);
+            }
+            break;
+        default:
+            // board.reset 或無法辨識的事件，重新載入整個看板
+            refreshBoard(projectId);
+    }
+}
+
+function refreshBoard(projectId) {
+    htmx.ajax("GET", `/lanes?project_id=${projectId}`, {
+        target: "#main-content",
+        swap: "innerHTML"
+    });
+}
+
+// 任務數以看板摘要的計數為準，短時間內的多次變更只查詢一次
+let laneCountTimer = null;
+
+function refreshLaneCounts() {
+    const container = document.getElementById("lanes-container");
+    const projectId = container ? container.dataset.projectId : "";
+    if (!projectId) return;
+    clearTimeout(laneCountTimer);
+    laneCountTimer = setTimeout(function () {
+        fetch(`/projects/${projectId}/summary`).then(function (response) {
+            return response.ok ? response.json() : null;
+        }).then(function (summary) {
+            if (!summary) return;
+            document.querySelectorAll("#lanes-container .lane-task-count").forEach(function (badge) {
+                badge.textContent = summary.lanes[badge.id.replace("lane-count-", "")] || 0;
+            });
+        });
+    }, 300);
+}
+
+function appendFragment(parentId, elementId, url) {
+    const parent = document.getElementById(parentId);
+    if (!parent || document.getElementById(elementId)) return;
+    // 泳道還有未載入的任務時，新任務會隨最後一頁載入
+    if (parent.querySelector(":scope > .task-page-loader")) return;
+    htmx.ajax("GET", url, { target: parent, swap: "beforeend" }).then(function () {
+        if (parent.classList.contains("task-list")) {
+            updateEmptyPlaceholder(parent);
+        }
+    });
+}
+
+function replaceFragment(elementId, url) {
+    const element = document.getElementById(elementId);
+    // 使用者正在行內編輯時不覆蓋，避免輸入中的內容消失
+    if (!element || element.querySelector('form[hx-post$="/update"]')) return;
+    htmx.ajax("GET", url, { target: element, swap: "outerHTML" });
+}
+
+function removeBoardElement(elementId) {
+    const element = document.getElementById(elementId);
+    if (!element) return;
+    const taskList = element.closest(".task-list");
+    element.remove();
+    if (taskList) {
+        updateEmptyPlaceholder(taskList);
+    }
+}
+
+// 將元素移到 parent 中第 index 個（從 1 開始）同類元素的位置，找不到元素時回傳 false
+function moveBoardElement(elementId, parentId, siblingSelector, index) {
+    const element = document.getElementById(elementId);
+    const parent = document.getElementById(parentId);
+    if (!element) return false;
+    const fromList = element.closest(".task-list");
+    if (!parent) {
+        // 移到不在此看板上的泳道
+        removeBoardElement(elementId);
+        return true;
+    }
+    const siblings = Array.from(parent.querySelectorAll(siblingSelector)).filter(function (sibling) {
+        return sibling !== element;
+    });
+    const reference = siblings[Math.max(index, 1) - 1] || null;
+    if (!reference && parent.querySelector(":scope > .task-page-loader")) {
+        // 目標位置在尚未載入的頁面中，等捲動到該頁時再顯示
+        removeBoardElement(elementId);
+        return true;
+    }
+    if (reference) {
+        parent.insertBefore(element, reference);
+    } else if (siblings.length) {
+        siblings[siblings.length - 1].after(element);
+    } else {
+        parent.prepend(element);
+    }
+    if (fromList) {
+        updateEmptyPlaceholder(fromList);
+        updateEmptyPlaceholder(parent);
+    }
+    return true;
+}
+
+// 將其他分頁移動、但本分頁尚未載入的任務放到目標泳道；目標位置也尚未載入時不處理
+function placeTaskCard(taskId, laneId, index) {
+    const list = document.getElementById(`task-list-${laneId}`);
+    if (!list) return;
+    const loaded = list.querySelectorAll(":scope > .task-item").length;
+    if (list.querySelector(":scope > .task-page-loader") && index > loaded) return;
+    htmx.ajax("GET", `/tasks/${taskId}/card`, { target: list, swap: "beforeend" }).then(function () {
+        moveBoardElement(`task-${taskId}`, list.id, ":scope > .task-item", index);
+    });
+}
@@ -1,7 +1,7 @@
-function confirmDeleteProject (projectName) {
+function confirmDeleteProject (projectId, projectName) {
     showConfirmAlert("確認刪除", `確定要刪除「${projectName}」專案嗎？`,
         function() {
-            htmx.ajax("POST", `/projects/${projectName}/delete`, {
+            htmx.ajax("POST", `/projects/${projectId}/delete`, {
                 target: "#main-content",
                 swap: "innerHTML"
             });
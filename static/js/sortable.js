@@ -5,6 +5,8 @@ window.taskSortable = function() {
             const laneId = rootElement.dataset.laneId;
             const sortable = Sortable.create(rootElement, {
                 group: "tasks",
+                // 只有任務卡片可拖拉並計入索引，載入點與空白提示不算
+                draggable: ".task-item",
                 animation: 150,
                 ghostClass: "bg-gray-200",
                 dragClass: "opacity-75",
@@ -24,7 +26,8 @@ window.taskSortable = function() {
                         method: 'PATCH',
                         headers: {
                             'Content-Type': 'application/x-www-form-urlencoded',
-                            'X-CSRFToken': csrf
+                            'X-CSRFToken': csrf,
+                            'X-Client-Id': boardClientId
                         },
                         body: new URLSearchParams({
                             'new_index': newIndex + 1,
@@ -40,6 +43,9 @@ window.taskSortable = function() {
                     }).then((data) => {
                         console.log("任務位置更新成功", data);
                         showSuccessAlert('任務位置已更新');
+                        if (fromLane !== toLane) {
+                            refreshLaneCounts();
+                        }
                     }).catch((error) => {
                         console.error("錯誤：", error);
                         showErrorAlert("更新任務位置失敗：" + (error.message || "伺服器錯誤"));
@@ -55,7 +61,8 @@ function updateEmptyPlaceholder(laneElement) {
     if (!laneElement) return;
     const taskItems = laneElement.querySelectorAll(".task-item");
     const placeholder = laneElement.querySelector(".empty-placeholder");
-    if (taskItems.length === 0) {
+    // 還有未載入的任務時不顯示提示字
+    if (taskItems.length === 0 && !laneElement.querySelector(".task-page-loader")) {
         // 如果泳道中沒有任務，顯示 “尚無任務” 提示字
         if (!placeholder) {
             const emptyPlaceholder = document.createElement("div");
@@ -89,7 +96,8 @@ window.laneSortable = function() {
                         method: 'PATCH',
                         headers: {
                             'Content-Type': 'application/x-www-form-urlencoded',
-                            'X-CSRFToken': csrf
+                            'X-CSRFToken': csrf,
+                            'X-Client-Id': boardClientId
                         },
                         body: new URLSearchParams({
                             'new_index': newIndex + 1,
@@ -31,9 +31,23 @@ function checkForMessages() {
 function confirmDeleteTask(taskId, taskName) {
     showConfirmAlert("確認刪除", `確定要刪除「${taskName}」該任務嗎？`,
         function() {
+            const taskElement = document.getElementById(`task-${taskId}`);
+            if (!taskElement) {
+                htmx.ajax("POST", `/tasks/${taskId}/delete`, {
+                    target: "#main-content",
+                    swap: "innerHTML"
+                });
+                return;
+            }
+            // 只移除該任務卡片，訊息以 hx-swap-oob 帶回
+            const taskList = taskElement.closest(".task-list");
             htmx.ajax("POST", `/tasks/${taskId}/delete`, {
-                target: "#main-content",
-                swap: "innerHTML"
+                target: `#task-${taskId}`,
+                swap: "outerHTML"
+            }).then(function() {
+                if (taskList) {
+                    updateEmptyPlaceholder(taskList);
+                }
             });
         }
     );
@@ -0,0 +1,9 @@
+import os
+
+# database.db 在匯入時就需要連線設定；測試不會連線到 Postgres，只要有值即可
+os.environ.setdefault("DB_NAME", "test")
+os.environ.setdefault("DB_USER", "test")
+os.environ.setdefault("DB_PASSWORD", "test")
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "5432")
+os.environ.setdefault("SECRET_KEY", "test")
@@ -0,0 +1,69 @@
+from utils.broker import Broker, InMemoryBroker
+import asyncio
+import pytest
+
+async def pending(subscription):
+    """不等待地取出下一則訊息，沒有訊息時回傳 None。"""
+    try:
+        return await asyncio.wait_for(subscription.get(), 0.01)
+    except asyncio.TimeoutError:
+        return None
+
+def test_publish_fans_out_to_channel_subscribers():
+    async def scenario():
+        broker = InMemoryBroker()
+        async with broker.subscribe("board:1") as first, broker.subscribe("board:1") as second, broker.subscribe("board:2") as other:
+            assert broker.stats()["subscribers"] == 3
+            await broker.publish("board:1", {"type": "task.updated", "id": 1})
+            assert await first.get() == {"type": "task.updated", "id": 1}
+            assert await second.get() == {"type": "task.updated", "id": 1}
+            assert await pending(other) is None
+        return broker.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["channels"] == 0
+    assert stats["subscribers"] == 0
+    assert stats["published"] == 1
+
+def test_publish_without_subscribers():
+    async def scenario():
+        broker = InMemoryBroker()
+        await broker.publish("board:1", {"type": "task.updated"})
+        return broker.stats()
+
+    assert asyncio.run(scenario())["published"] == 1
+
+def test_full_queue_is_replaced_by_reset():
+    async def scenario():
+        broker = InMemoryBroker(queue_size=2)
+        async with broker.subscribe("board:1") as slow, broker.subscribe("board:1") as fast:
+            for index in range(2):
+                await broker.publish("board:1", {"type": "task.updated", "id": index})
+                await fast.get()
+            await broker.publish("board:1", {"type": "task.updated", "id": 2})
+            assert await slow.get() == {"type": "board.reset"}
+            assert await pending(slow) is None
+            assert await fast.get() == {"type": "task.updated", "id": 2}
+            return broker.stats()
+
+    assert asyncio.run(scenario())["dropped"] == 1
+
+def test_unsubscribe_on_error():
+    async def scenario():
+        broker = InMemoryBroker()
+        try:
+            async with broker.subscribe("board:1"):
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        return broker.stats()
+
+    assert asyncio.run(scenario())["channels"] == 0
+
+def test_broker_subclass_must_implement_publish_and_subscribe():
+    class PublishOnly(Broker):
+        async def publish(self, channel: str, message: dict):
+            pass
+
+    with pytest.raises(TypeError):
+        PublishOnly()
@@ -0,0 +1,139 @@
+from starlette.applications import Starlette
+from starlette.responses import HTMLResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from middleware import CompressionMiddleware
+from utils import compression
+from utils.compression import COMPRESSION_MIN_SIZE, COMPRESSORS, choose_encoding, compressed_cache
+import gzip
+import pytest
+
+BODY = "<li>任務</li>" * COMPRESSION_MIN_SIZE
+
+async def board(request):
+    return HTMLResponse(BODY, headers={"ETag": '"board"'})
+
+async def report(request):
+    return HTMLResponse(BODY)
+
+async def small(request):
+    return HTMLResponse("<p>ok</p>")
+
+async def position(request):
+    return JSONResponse({"items": ["x"] * COMPRESSION_MIN_SIZE})
+
+async def image(request):
+    return Response(b"\0" * (COMPRESSION_MIN_SIZE * 2), media_type="image/png")
+
+async def encoded(request):
+    return Response(gzip.compress(BODY.encode()), media_type="text/html", headers={"Content-Encoding": "gzip"})
+
+async def stream(request):
+    async def chunks():
+        for _ in range(3):
+            yield BODY
+    return StreamingResponse(chunks(), media_type="text/html")
+
+async def not_modified(request):
+    return Response(status_code=304, headers={"ETag": '"board"'})
+
+app = Starlette(routes=[
+    Route("/board", board),
+    Route("/report", report),
+    Route("/small", small),
+    Route("/tasks/1/position", position, methods=["POST"]),
+    Route("/image", image),
+    Route("/encoded", encoded),
+    Route("/stream", stream),
+    Route("/not-modified", not_modified),
+])
+app.add_middleware(CompressionMiddleware)
+client = TestClient(app)
+
+def get(path, accept_encoding, method="GET"):
+    return client.request(method, path, headers={"Accept-Encoding": accept_encoding})
+
+def test_choose_encoding_prefers_installed_order():
+    assert choose_encoding({"gzip", "br", "zstd"}) == next(iter(COMPRESSORS))
+    assert choose_encoding({"gzip"}) == "gzip"
+    assert choose_encoding({"deflate"}) is None
+
+def test_gzip_response():
+    response = get("/board", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"] == 'W/"board"'
+    assert response.text == BODY
+
+@pytest.mark.parametrize("encoding", [name for name in COMPRESSORS if name != "gzip"])
+def test_preferred_encoding(encoding):
+    response = get("/board", f"gzip, {encoding}")
+    assert response.headers["content-encoding"] == encoding
+    assert int(response.headers["content-length"]) < len(BODY.encode())
+
+def test_q_zero_is_not_accepted():
+    response = get("/board", "gzip;q=0")
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"board"'
+
+def test_identity_without_accept_encoding():
+    response = get("/board", "identity")
+    assert "content-encoding" not in response.headers
+    assert response.text == BODY
+
+def test_small_response_is_not_compressed():
+    response = get("/small", "gzip")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+def test_excluded_position_path():
+    response = get("/tasks/1/position", "gzip", method="POST")
+    assert "content-encoding" not in response.headers
+
+def test_incompressible_content_type():
+    response = get("/image", "gzip")
+    assert "content-encoding" not in response.headers
+
+def test_already_encoded_response_passes_through():
+    response = get("/encoded", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == BODY
+
+def test_streaming_response_is_compressed_without_length():
+    response = get("/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == BODY * 3
+
+def test_not_modified_passes_through():
+    response = get("/not-modified", "gzip")
+    assert response.status_code == 304
+    assert "content-encoding" not in response.headers
+
+def count_compressions(monkeypatch):
+    calls = []
+    original = compression._compress
+
+    def counting(encoding, body):
+        calls.append(encoding)
+        return original(encoding, body)
+
+    monkeypatch.setattr(compression, "_compress", counting)
+    compressed_cache.clear()
+    return calls
+
+def test_response_with_etag_is_compressed_once(monkeypatch):
+    calls = count_compressions(monkeypatch)
+    first = get("/board", "gzip")
+    second = get("/board", "gzip")
+    assert calls == ["gzip"]
+    assert second.content == first.content
+    assert second.headers["etag"] == 'W/"board"'
+    get("/board?project_id=2", "gzip")
+    assert calls == ["gzip", "gzip"]
+
+def test_response_without_etag_is_not_cached(monkeypatch):
+    calls = count_compressions(monkeypatch)
+    get("/report", "gzip")
+    get("/report", "gzip")
+    assert calls == ["gzip", "gzip"]
@@ -0,0 +1,65 @@
+from utils.fragment_cache import FragmentCache
+
+def test_get_and_set():
+    cache = FragmentCache()
+    assert cache.get("a") is None
+    cache.set("a", "<p>a</p>")
+    assert cache.get("a") == "<p>a</p>"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_byte_cap_evicts_least_recently_used():
+    cache = FragmentCache(max_bytes=10)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    cache.get("a")
+    cache.set("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
+    assert cache.bytes == 8
+    assert cache.evictions == 1
+
+def test_byte_cap_counts_utf8_bytes():
+    cache = FragmentCache(max_bytes=6)
+    cache.set("a", "泳道")
+    assert cache.bytes == 6
+    cache.set("b", "x")
+    assert cache.get("a") is None
+    assert cache.bytes == 1
+
+def test_value_larger_than_cap_is_not_cached():
+    cache = FragmentCache(max_bytes=4)
+    cache.set("a", "abc")
+    cache.set("b", "abcde")
+    assert cache.get("b") is None
+    assert cache.get("a") == "abc"
+
+def test_entry_cap():
+    cache = FragmentCache(max_entries=2)
+    for key in "abc":
+        cache.set(key, key)
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 2
+
+def test_replacing_a_key_updates_bytes():
+    cache = FragmentCache()
+    cache.set("a", "aaaa")
+    cache.set("a", "aa")
+    assert cache.bytes == 2
+    assert cache.get("a") == "aa"
+
+def test_group_keeps_only_latest_version():
+    cache = FragmentCache()
+    cache.set(("board", 1, 1), "v1", group=("board", 1))
+    cache.set(("board", 1, 2), "v2", group=("board", 1))
+    assert cache.get(("board", 1, 1)) is None
+    assert cache.get(("board", 1, 2)) == "v2"
+    assert cache.bytes == 2
+
+def test_clear():
+    cache = FragmentCache()
+    cache.set("a", "a", group="g")
+    cache.clear()
+    assert cache.get("a") is None
+    assert cache.bytes == 0
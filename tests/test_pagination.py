@@ -0,0 +1,36 @@
+from fastapi import HTTPException
+from utils.pagination import MAX_PAGE_SIZE, PAGE_SIZE, decode_cursor, encode_cursor, page_size
+import base64
+import pytest
+
+def test_cursor_round_trip():
+    values = [3072, "進行中", 1.5, 42]
+    assert decode_cursor(encode_cursor(values), len(values)) == values
+
+def test_cursor_accepts_generator_and_has_no_padding():
+    cursor = encode_cursor(value for value in (1, 2))
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 2) == [1, 2]
+
+@pytest.mark.parametrize("cursor", ["not base64!", base64.urlsafe_b64encode(b"{bad").decode(), base64.urlsafe_b64encode(b"\xff\xfe").decode()])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, 1)
+    assert exc_info.value.status_code == 400
+
+@pytest.mark.parametrize("values", [[1], [1, 2, 3], [1, None], [1, [2]]])
+def test_cursor_with_wrong_shape_is_rejected(values):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(encode_cursor(values), 2)
+    assert exc_info.value.status_code == 400
+
+def test_cursor_that_is_not_a_list_is_rejected():
+    cursor = base64.urlsafe_b64encode(b'{"id":1}').decode().rstrip("=")
+    with pytest.raises(HTTPException):
+        decode_cursor(cursor, 1)
+
+def test_page_size_bounds():
+    assert page_size() == PAGE_SIZE
+    assert page_size(0) == PAGE_SIZE
+    assert page_size(MAX_PAGE_SIZE + 1) == MAX_PAGE_SIZE
+    assert page_size(-5) == 1
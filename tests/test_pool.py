@@ -0,0 +1,57 @@
+from sqlalchemy import exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from database.pool import TimedQueuePool
+import asyncio
+import pytest
+
+def make_engine(**kwargs):
+    return create_async_engine("sqlite+aiosqlite://", poolclass=TimedQueuePool, pool_size=1, max_overflow=0, pool_timeout=0.05, **kwargs)
+
+async def checkout_twice(engine):
+    """佔用唯一的連線後再取一次，第二次應逾時。"""
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            async with engine.connect():
+                pass
+    finally:
+        await engine.dispose()
+
+async def connect(engine):
+    try:
+        async with engine.connect():
+            pass
+    finally:
+        await engine.dispose()
+
+@pytest.fixture(autouse=True)
+def wait_stats():
+    # 統計為整個行程共用，每個測試前歸零
+    TimedQueuePool.wait_stats.reset()
+    yield TimedQueuePool.wait_stats
+
+def test_checkout_is_recorded(wait_stats):
+    engine = make_engine()
+    asyncio.run(connect(engine))
+    stats = wait_stats.snapshot()
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 0
+
+def test_pool_timeout_is_counted(wait_stats):
+    engine = make_engine()
+    with pytest.raises(exc.TimeoutError):
+        asyncio.run(checkout_twice(engine))
+    stats = wait_stats.snapshot()
+    assert stats["timeouts"] == 1
+    assert stats["checkouts"] == 1
+
+def test_connect_error_is_not_counted_as_timeout(wait_stats):
+    async def refuse():
+        raise ConnectionRefusedError("connection refused")
+
+    engine = make_engine(async_creator=refuse)
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(connect(engine))
+    stats = wait_stats.snapshot()
+    assert stats["timeouts"] == 0
+    assert stats["checkouts"] == 0
@@ -0,0 +1,86 @@
+from fastapi import BackgroundTasks
+from sqlalchemy import Column, Integer, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from utils.position import POSITION_GAP, REBALANCE_THRESHOLD, move_to_index, needs_rebalance, position_between, positions_between
+import asyncio
+
+Base = declarative_base()
+
+class Item(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    group_id = Column(Integer)
+    position = Column(Integer)
+
+def test_position_between_empty_group():
+    assert position_between(None, None) == POSITION_GAP
+
+def test_position_between_edges():
+    assert position_between(None, 1024) == 0
+    assert position_between(1024, None) == 2048
+
+def test_position_between_midpoint():
+    assert position_between(1024, 2048) == 1536
+
+def test_position_between_exhausted():
+    assert position_between(10, 11) is None
+    assert position_between(10, 10) is None
+
+def test_positions_between_matches_position_between_for_one():
+    for before, after in [(None, None), (None, 500), (500, None), (10, 12), (0, 1024)]:
+        assert positions_between(before, after, 1) == [position_between(before, after)]
+    assert positions_between(10, 11, 1) is None
+
+def test_positions_between_spreads_evenly():
+    assert positions_between(0, 1000, 3) == [250, 500, 750]
+    assert positions_between(None, 4096, 2) == [2048, 3072]
+    assert positions_between(1024, None, 2) == [2048, 3072]
+
+def test_positions_between_exhausted():
+    assert positions_between(10, 13, 3) is None
+    assert positions_between(10, 14, 3) == [11, 12, 13]
+
+def test_needs_rebalance():
+    assert not needs_rebalance(None, 1024, None)
+    assert not needs_rebalance(0, REBALANCE_THRESHOLD, 2 * REBALANCE_THRESHOLD)
+    assert needs_rebalance(0, REBALANCE_THRESHOLD - 1, 1024)
+    assert needs_rebalance(0, 1024, 1024 + REBALANCE_THRESHOLD - 1)
+
+async def _move(positions, item_id, new_index):
+    """建立一組排序值為 positions 的項目（id 從 1 開始），將 item_id 移到 new_index，回傳新順序與背景工作數。"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+    try:
+        async with session() as db:
+            db.add_all([Item(id=index, group_id=1, position=position) for index, position in enumerate(positions, start=1)])
+            db.add(Item(id=100, group_id=2, position=1))
+            await db.commit()
+            item = await db.get(Item, item_id)
+            background_tasks = BackgroundTasks()
+            await move_to_index(db, item, Item.group_id, 1, new_index, background_tasks)
+            await db.commit()
+            order = (await db.scalars(select(Item.id).where(Item.group_id == 1).order_by(Item.position.asc().nulls_last(), Item.id))).all()
+            return list(order), len(background_tasks.tasks)
+    finally:
+        await engine.dispose()
+
+def test_move_to_index_to_front():
+    assert asyncio.run(_move([1024, 2048, 3072], 3, 1)) == ([3, 1, 2], 0)
+
+def test_move_to_index_to_middle():
+    assert asyncio.run(_move([1024, 2048, 3072], 1, 2)) == ([2, 1, 3], 0)
+
+def test_move_to_index_past_end():
+    assert asyncio.run(_move([1024, 2048, 3072], 1, 10)) == ([2, 3, 1], 0)
+
+def test_move_to_index_rebalances_exhausted_gap():
+    assert asyncio.run(_move([1, 2, 3], 3, 2)) == ([1, 3, 2], 0)
+
+def test_move_to_index_with_missing_positions():
+    assert asyncio.run(_move([1024, None, None], 3, 1)) == ([3, 1, 2], 0)
+
+def test_move_to_index_schedules_rebalance_for_small_gap():
+    assert asyncio.run(_move([1024, 1030, 2048], 3, 2)) == ([1, 3, 2], 1)
@@ -0,0 +1,25 @@
+from utils.position import POSITION_GAP
+from utils.task_batch import lane_positions
+
+OLD = {1: (1, 1024), 2: (1, 2048), 3: (1, 3072)}
+
+def test_moved_task_takes_midpoint_and_others_keep_positions():
+    assert lane_positions([1, 9, 2, 3], {9}, OLD) == {9: 1536}
+
+def test_consecutive_moved_tasks_share_the_gap():
+    assert lane_positions([1, 8, 9, 2, 3], {8, 9}, OLD) == {8: 1365, 9: 1706}
+
+def test_moved_tasks_at_head_and_tail():
+    assert lane_positions([9, 1, 2, 3, 8], {8, 9}, OLD) == {9: 0, 8: 3072 + POSITION_GAP}
+
+def test_reordered_existing_task():
+    assert lane_positions([2, 1, 3], {2}, OLD) == {2: 0}
+
+def test_empty_lane():
+    assert lane_positions([8, 9], {8, 9}, {}) == {8: POSITION_GAP, 9: 2 * POSITION_GAP}
+
+def test_exhausted_gap_requests_renumbering():
+    assert lane_positions([1, 8, 9, 2], {8, 9}, {1: (1, 10), 2: (1, 12)}) is None
+
+def test_small_gap_requests_renumbering():
+    assert lane_positions([1, 9, 2], {9}, {1: (1, 10), 2: (1, 20)}) is None
@@ -0,0 +1,35 @@
+from utils import transfer
+from utils.transfer import ImportFormatError, read_records, record_batches
+import asyncio
+import io
+import pytest
+import tempfile
+
+def spooled(content: bytes):
+    """建立已寫入磁碟的暫存檔，與大型上傳檔案相同。"""
+    file = tempfile.SpooledTemporaryFile(max_size=1)
+    file.write(content)
+    return file
+
+def test_read_records_ndjson_can_be_read_twice():
+    file = spooled('﻿{"lane":"A","name":"一"}\n\n{"lane":"B","name":"二"}\n'.encode())
+    assert list(read_records(file, "ndjson")) == [{"lane": "A", "name": "一"}, {"lane": "B", "name": "二"}]
+    assert len(list(read_records(file, "ndjson"))) == 2
+    assert not file.closed
+
+def test_read_records_csv_with_multiline_field():
+    file = spooled(b'type,lane,name\ntask,A,"line 1\nline 2"\n')
+    assert list(read_records(file, "csv")) == [{"type": "task", "lane": "A", "name": "line 1\nline 2"}]
+
+def test_read_records_reports_invalid_json_line():
+    with pytest.raises(ImportFormatError, match="第 2 行"):
+        list(read_records(io.BytesIO(b'{"lane":"A"}\n{bad\n'), "ndjson"))
+
+def test_record_batches_use_fixed_size(monkeypatch):
+    monkeypatch.setattr(transfer, "IMPORT_BATCH_SIZE", 2)
+    file = spooled(b"".join(b'{"lane":"A","name":"%d"}\n' % index for index in range(5)))
+
+    async def sizes():
+        return [len(batch) async for batch in record_batches(file, "ndjson")]
+
+    assert asyncio.run(sizes()) == [2, 2, 1]
@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+from utils import user_cache as user_cache_module
+from utils.user_cache import CachedUser, UserCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def make_user(user_id, **fields):
+    return SimpleNamespace(id=user_id, name=f"user{user_id}", email=f"user{user_id}@example.com", is_active=1, **fields)
+
+def test_set_keeps_only_cached_fields():
+    cache = UserCache()
+    cached = cache.set(make_user(1, password="hash"))
+    assert cached == CachedUser(id=1, name="user1", email="user1@example.com", is_active=True)
+    assert cache.get(1) is cached
+
+def test_entry_expires_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(user_cache_module.time, "monotonic", clock)
+    cache = UserCache(ttl=60)
+    cache.set(make_user(1))
+    clock.now += 60
+    assert cache.get(1) is not None
+    clock.now += 0.1
+    assert cache.get(1) is None
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["misses"] == 1
+
+def test_set_refreshes_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(user_cache_module.time, "monotonic", clock)
+    cache = UserCache(ttl=60)
+    cache.set(make_user(1))
+    clock.now += 50
+    cache.set(make_user(1))
+    clock.now += 50
+    assert cache.get(1) is not None
+
+def test_maxsize_evicts_least_recently_used():
+    cache = UserCache(maxsize=2)
+    cache.set(make_user(1))
+    cache.set(make_user(2))
+    cache.get(1)
+    cache.set(make_user(3))
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.get(3) is not None
+
+def test_invalidate():
+    cache = UserCache()
+    cache.set(make_user(1))
+    cache.invalidate(1)
+    cache.invalidate(2)
+    assert cache.get(1) is None
@@ -1,39 +1,47 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from models.user import User
 from utils.get_db import get_db
+from utils.user_cache import CachedUser, user_cache
+from utils.hashing import hashing_executor, pwd_context
 from fastapi import Request
 import os
 
-# 密碼加密設定
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWT 設定
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
 # 1 天
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
+# 可存取 /internal 統計端點的使用者 email，以逗號分隔；未設定時所有人都無法存取
+INTERNAL_ALLOWED_EMAILS = {email.strip().lower() for email in os.getenv("INTERNAL_ALLOWED_EMAILS", "").split(",") if email.strip()}
+
 # OAuth2 設定
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login", auto_error=False)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    """驗證密碼，成本設定變更時一併回傳新的雜湊值。"""
+    return await hashing_executor.run(pwd_context.verify_and_update, plain_password, hashed_password)
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await hashing_executor.run(pwd_context.hash, password)
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(User).filter(User.email == email).first()
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await db.scalar(select(User).where(User.email == email))
     if not user:
         return False
-    if not verify_password(password, user.password):
+    valid, new_hash = await verify_password(password, user.password)
+    if not valid:
         return False
+    if new_hash:
+        # 雜湊成本與目前設定不同，登入成功時順便更新
+        user.password = new_hash
+        await db.commit()
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -46,29 +54,58 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(request: Request, db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="身份驗證無效。", headers={"WWW-Authenticate": "Bearer"},)
-    token = get_token_from_cookie(request)
-    if not token:
-        raise credentials_exception
+def decode_access_token(token: str):
+    """解析 JWT，失敗時回傳 None。"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
+        return None
+
+async def get_current_user(request: Request, db: AsyncSession = Depends(get_db)) -> CachedUser:
+    """取得目前登入的使用者。
+
+    回傳的是快取中的 CachedUser（id、name、email、is_active），不是 ORM 的 User：
+    沒有關聯屬性，也不屬於任何 Session。需要修改使用者資料時，請以 id 另外查詢 User。
+    """
+    credentials_exception = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="身份驗證無效。", headers={"WWW-Authenticate": "Bearer"},)
+    # 中介層已解析過 token 時直接沿用，避免重複解析
+    payload = getattr(request.state, "token_payload", None)
+    if payload is None:
+        token = get_token_from_cookie(request)
+        if not token:
+            raise credentials_exception
+        payload = decode_access_token(token)
+        if payload is None:
+            raise credentials_exception
+    email: str = payload.get("sub")
+    if email is None:
         raise credentials_exception
-    user = db.query(User).filter(User.email == email).first()
+    user_id = payload.get("uid")
+    if user_id is not None:
+        cached = user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        user = await db.get(User, user_id)
+    else:
+        # 舊版 token 沒有 uid，改用電子郵件查詢
+        user = await db.scalar(select(User).where(User.email == email))
     if user is None:
         raise credentials_exception
-    return user
+    return user_cache.set(user)
 
-async def get_current_active_user(request: Request = None, db: Session = Depends(get_db)):
+async def get_current_active_user(request: Request = None, db: AsyncSession = Depends(get_db)) -> CachedUser:
+    """同 get_current_user，並拒絕已停用的使用者。"""
     current_user = await get_current_user(request, db)
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="使用者已停用。")
     return current_user
 
+async def get_internal_user(current_user: CachedUser = Depends(get_current_active_user)) -> CachedUser:
+    """只允許 INTERNAL_ALLOWED_EMAILS 內的使用者存取內部統計端點。"""
+    if (current_user.email or "").lower() not in INTERNAL_ALLOWED_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="沒有權限存取此頁面。")
+    return current_user
+
 def get_token_from_cookie(request: Request):
     token = request.cookies.get("access_token")
     if token and token.startswith("Bearer "):
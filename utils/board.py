@@ -0,0 +1,171 @@
+from fastapi import Request
+from app import templates
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, selectinload
+from models.project import Project
+from models.lane import Lane
+from models.task import Task
+from utils.counters import lane_counts
+from utils.fragment_cache import fragment_cache
+from utils.broker import broker
+import asyncio
+import hashlib
+import json
+import os
+
+# SSE 連線閒置時送出心跳註解的間隔（秒），避免被代理伺服器切斷
+SSE_HEARTBEAT = int(os.getenv("SSE_HEARTBEAT", "15"))
+
+async def bump_board_version(db: AsyncSession, *project_ids):
+    """在同一交易中遞增專案的看板版本，需由呼叫端提交。"""
+    project_ids = {project_id for project_id in project_ids if project_id}
+    if not project_ids:
+        return
+    await db.execute(update(Project).where(Project.id.in_(project_ids)).values(board_version=Project.board_version + 1))
+
+async def bump_board_version_for_lanes(db: AsyncSession, *lane_ids):
+    """依泳道所屬的專案遞增看板版本，回傳受影響的專案 id。"""
+    lane_ids = {lane_id for lane_id in lane_ids if lane_id}
+    if not lane_ids:
+        return set()
+    project_ids = select(Lane.project_id).where(Lane.id.in_(lane_ids)).scalar_subquery()
+    result = await db.execute(update(Project).where(Project.id.in_(project_ids)).values(board_version=Project.board_version + 1).returning(Project.id))
+    return set(result.scalars().all())
+
+async def bump_all_board_versions(db: AsyncSession):
+    await db.execute(update(Project).values(board_version=Project.board_version + 1))
+
+async def get_board_version(db: AsyncSession, project_id: int):
+    """以主鍵取得看板版本，專案不存在時回傳 None。"""
+    return await db.scalar(select(Project.board_version).where(Project.id == project_id))
+
+def board_statement(project_id: int):
+    return (
+        select(Project)
+        .outerjoin(Project.lanes)
+        .outerjoin(Lane.tasks)
+        .options(contains_eager(Project.lanes).contains_eager(Lane.tasks))
+        .where(Project.id == project_id)
+        .order_by(Lane.position, Lane.id, Task.position, Task.id)
+        .execution_options(populate_existing=True)
+    )
+
+async def load_board(db: AsyncSession, project_id: int):
+    """以單一查詢載入專案、泳道與任務，專案不存在時回傳 None。"""
+    return (await db.execute(board_statement(project_id))).unique().scalar_one_or_none()
+
+def board_shell_statement(project_id: int):
+    return (
+        select(Project)
+        .outerjoin(Project.lanes)
+        .options(contains_eager(Project.lanes))
+        .where(Project.id == project_id)
+        .order_by(Lane.position, Lane.id)
+        .execution_options(populate_existing=True)
+    )
+
+async def load_board_shell(db: AsyncSession, project_id: int):
+    """只載入專案與泳道，任務由各泳道捲動到可見範圍時分頁載入；專案不存在時回傳 None。"""
+    return (await db.execute(board_shell_statement(project_id))).unique().scalar_one_or_none()
+
+async def load_lane(db: AsyncSession, lane_id: int):
+    """載入單一泳道及其專案，供泳道片段渲染使用。"""
+    stmt = select(Lane).options(selectinload(Lane.project)).where(Lane.id == lane_id).execution_options(populate_existing=True)
+    return await db.scalar(stmt)
+
+def board_etag(project_id: int, version: int, variant: str = ""):
+    return f'W/"board-{project_id}-{version}{"-" + variant if variant else ""}"'
+
+def is_not_modified(request: Request, etag: str):
+    """比對 If-None-Match，內容未變更時回傳 True。"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip() for tag in if_none_match.split(",")]
+
+def board_snapshot(project):
+    """將已載入的看板轉為 JSON 可序列化的結構。"""
+    return {
+        "project": {"id": project.id, "name": project.name, "description": project.description},
+        "version": project.board_version,
+        "lanes": [
+            {
+                "id": lane.id,
+                "name": lane.name,
+                "position": lane.position,
+                "tasks": [
+                    {"id": task.id, "name": task.name, "position": task.position, "status": task.status, "priority": task.priority, "user_id": task.user_id}
+                    for task in lane.tasks
+                ],
+            }
+            for lane in project.lanes
+        ],
+    }
+
+def lane_signature(lane, project_id, task_count):
+    """泳道片段的內容摘要；lane_item.html 使用新的欄位時需一併加入。"""
+    data = (lane.id, lane.name, project_id, task_count)
+    return hashlib.blake2b(repr(data).encode("utf-8"), digest_size=16).hexdigest()
+
+def render_lane(request: Request, lane, project, task_count: int = None):
+    """渲染單一泳道片段（標題、任務數與第一頁任務的載入點），內容未變更時直接使用快取。
+
+    任務一律由載入點取得，task_count 只作為標題旁的數字；計數失準時任務仍會顯示。
+    task_count 為 None 表示沒有計數（不屬於專案的泳道），不顯示數字。
+    """
+    key = ("lane", lane_signature(lane, project.id if project else None, task_count))
+    content = fragment_cache.get(key)
+    if content is None:
+        content = templates.get_template("lanes/partials/lane_item.html").render({"request": request, "lane": lane, "project": project, "task_count": task_count})
+        fragment_cache.set(key, content, group=("lane", lane.id))
+    return content
+
+async def render_board(request: Request, db: AsyncSession, project_id: int, version: int = None):
+    """渲染專案看板片段，以 (專案, 版本) 快取整體結果，並重用未變更的泳道片段。
+
+    片段只包含泳道與任務數，不載入任何任務，大型看板送出第一個位元組的時間不受任務數影響。
+    專案不存在時回傳 None。
+    """
+    if version is None:
+        version = await get_board_version(db, project_id)
+        if version is None:
+            return None
+    content = fragment_cache.get(("board", project_id, version))
+    if content is not None:
+        return content
+    project = await load_board_shell(db, project_id)
+    if project is None:
+        return None
+    counts = await lane_counts(db, project_id)
+    lane_fragments = [render_lane(request, lane, project, counts.get(lane.id, 0)) for lane in project.lanes]
+    content = templates.get_template("lanes/partials/lanes_list.html").render({"request": request, "lanes": project.lanes, "project": project, "lane_fragments": lane_fragments})
+    fragment_cache.set(("board", project_id, project.board_version), content, group=("board", project_id))
+    return content
+
+def board_channel(project_id: int):
+    return f"board:{project_id}"
+
+async def publish_board_event(request: Request, project_id: int, event_type: str, **data):
+    """提交後發布看板變更事件。
+
+    origin 為發出請求的分頁（X-Client-Id 標頭），前端據此略過自己造成的事件。
+    """
+    if not project_id:
+        return
+    message = {"type": event_type, "origin": request.headers.get("X-Client-Id"), **data}
+    await broker.publish(board_channel(project_id), message)
+
+async def board_event_stream(project_id: int):
+    """SSE 串流產生器，連線中斷時由 Starlette 取消並自動退訂。"""
+    async with broker.subscribe(board_channel(project_id)) as subscription:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), SSE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"data: {json.dumps(message, ensure_ascii=False, separators=(',', ':'))}\n\n"
@@ -0,0 +1,78 @@
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+import asyncio
+import os
+
+class Broker(ABC):
+    """看板事件的發布／訂閱介面。
+
+    目前只有單一行程內的 InMemoryBroker；多個 worker 或多台主機時，
+    以外部訊息服務（如 Redis pub/sub）實作相同的 publish 與 subscribe 即可替換。
+    """
+
+    @abstractmethod
+    async def publish(self, channel: str, message: dict):
+        ...
+
+    @abstractmethod
+    def subscribe(self, channel: str):
+        """回傳 async context manager，進入後得到可 await get() 的訂閱物件。"""
+        ...
+
+    def stats(self):
+        return {}
+
+class Subscription:
+    def __init__(self, queue: asyncio.Queue):
+        self._queue = queue
+
+    async def get(self):
+        return await self._queue.get()
+
+class InMemoryBroker(Broker):
+    """以 asyncio.Queue 將訊息送給同一行程內的訂閱者。
+
+    每個訂閱者的佇列有上限，連線過慢而佇列滿時清空並改送 board.reset，
+    讓前端重新載入整個看板，避免無限制佔用記憶體。
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._channels = {}
+        self.published = 0
+        self.dropped = 0
+
+    async def publish(self, channel: str, message: dict):
+        self.published += 1
+        for queue in list(self._channels.get(channel, ())):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self.dropped += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "board.reset"})
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._channels.setdefault(channel, set()).add(queue)
+        try:
+            yield Subscription(queue)
+        finally:
+            subscribers = self._channels.get(channel)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._channels[channel]
+
+    def stats(self):
+        return {
+            "backend": "memory",
+            "channels": len(self._channels),
+            "subscribers": sum(len(subscribers) for subscribers in self._channels.values()),
+            "published": self.published,
+            "dropped": self.dropped,
+        }
+
+broker = InMemoryBroker(queue_size=int(os.getenv("BROKER_QUEUE_SIZE", "100")))
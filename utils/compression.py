@@ -0,0 +1,118 @@
+from anyio import to_thread
+import gzip
+import logging
+import os
+import re
+import zlib
+from utils.fragment_cache import FragmentCache
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 小於此大小的回應不壓縮，壓縮的 CPU 成本高於省下的傳輸量
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# 帶 ETag 的完整回應以 (路徑, 查詢字串, ETag, 編碼) 快取壓縮結果，同一版本的看板只壓縮一次
+COMPRESSION_CACHE_MAX_ENTRIES = int(os.getenv("COMPRESSION_CACHE_MAX_ENTRIES", "512"))
+COMPRESSION_CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+# 超過此大小的回應改在執行緒中壓縮（zlib、brotli、zstd 壓縮時會釋放 GIL），不阻塞事件迴圈
+COMPRESSION_THREAD_SIZE = int(os.getenv("COMPRESSION_THREAD_SIZE", "65536"))
+
+COMPRESSIBLE_TYPES = ("text/html", "text/css", "text/plain", "text/csv", "text/javascript", "application/javascript", "application/json", "application/x-ndjson")
+# 拖拉排序的 JSON 回覆很小且頻繁，直接略過；SSE 需逐筆送出，也不壓縮
+EXCLUDED_PATHS = re.compile(r"^/(?:tasks|lanes)/\d+/position$|^/lanes/events$")
+
+class GzipCompressor:
+    def __init__(self):
+        # wbits=31 產生帶 gzip 標頭的串流
+        self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+class BrotliCompressor:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+class ZstdCompressor:
+    def __init__(self):
+        self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+# 依偏好順序排列，只列出已安裝的編碼
+COMPRESSORS = {"gzip": GzipCompressor}
+if zstandard is not None:
+    COMPRESSORS = {"zstd": ZstdCompressor, **COMPRESSORS}
+if brotli is not None:
+    COMPRESSORS = {"br": BrotliCompressor, **COMPRESSORS}
+
+# 兩者皆為必要相依套件，缺少時仍可運作但只能以 gzip 壓縮，靜態檔案也不會有 br 版本
+for package, module in (("brotli", brotli), ("zstandard", zstandard)):
+    if module is None:
+        logger.warning("未安裝壓縮套件，相關編碼不會提供", extra={"fields": {"package": package, "encodings": list(COMPRESSORS)}})
+
+compressed_cache = FragmentCache(max_entries=COMPRESSION_CACHE_MAX_ENTRIES, max_bytes=COMPRESSION_CACHE_MAX_BYTES)
+
+def choose_encoding(accepted):
+    return next((name for name in COMPRESSORS if name in accepted), None)
+
+def is_compressible(content_type: str):
+    return content_type.split(";", 1)[0].strip().lower() in COMPRESSIBLE_TYPES
+
+def _compress(encoding: str, body: bytes):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+    compressor = COMPRESSORS[encoding]()
+    return compressor.compress(body) + compressor.finish()
+
+async def compress_body(encoding: str, body: bytes, cache_key=None):
+    """一次壓縮完整的回應本體，大型本體交給執行緒。
+
+    cache_key 為 None 以外的值時重用相同鍵先前的壓縮結果；鍵需能代表本體內容（例如含 ETag）。
+    """
+    if cache_key is not None:
+        key = (*cache_key, encoding)
+        compressed = compressed_cache.get(key)
+        if compressed is not None:
+            return compressed
+    if len(body) >= COMPRESSION_THREAD_SIZE:
+        compressed = await to_thread.run_sync(_compress, encoding, body)
+    else:
+        compressed = _compress(encoding, body)
+    if cache_key is not None:
+        compressed_cache.set(key, compressed)
+    return compressed
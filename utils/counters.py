@@ -0,0 +1,155 @@
+"""看板計數的增減、校正與摘要。
+
+任務異動的路徑先遞增看板版本（鎖住專案列）再呼叫 adjust_counters，
+reconcile_counters 同樣先鎖住專案列，兩者不會交錯寫入同一專案的計數。
+定期校正可由排程執行：
+
+    python -m utils.counters --interval 3600
+"""
+from collections import Counter
+from sqlalchemy import String, cast, delete, func, insert, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.board_counter import BoardCounter
+from models.lane import Lane
+from models.project import Project
+from models.task import Task
+from models.user_project import UserProject
+import argparse
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 定期校正時每個交易處理的專案數
+RECONCILE_BATCH_SIZE = int(os.getenv("COUNTER_RECONCILE_BATCH_SIZE", "100"))
+
+def task_deltas(deltas: Counter, project_id, lane_id, user_id, status, sign: int):
+    """將一筆任務計入（sign=1）或移出（sign=-1）deltas；不屬於任何專案的任務不計數。"""
+    if project_id is None or lane_id is None:
+        return deltas
+    deltas[(project_id, "lane", str(lane_id))] += sign
+    deltas[(project_id, "user", str(user_id) if user_id else "")] += sign
+    deltas[(project_id, "status", status or "")] += sign
+    return deltas
+
+async def adjust_counters(db: AsyncSession, deltas: Counter):
+    """以單一 upsert 套用增減；依主鍵排序寫入，同時更新多個計數的交易不會互相鎖死。"""
+    rows = [{"project_id": project_id, "dimension": dimension, "key": key, "count": delta} for (project_id, dimension, key), delta in sorted(deltas.items()) if delta]
+    if not rows:
+        return
+    table = BoardCounter.__table__
+    stmt = pg_insert(table)
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.project_id, table.c.dimension, table.c.key], set_={"count": table.c.count + stmt.excluded["count"]})
+    await db.execute(stmt, rows)
+
+def _counts_by_project(rows):
+    counts = {}
+    for project_id, dimension, key, count in rows:
+        if count:
+            counts.setdefault(project_id, {})[(dimension, key)] = count
+    return counts
+
+async def reconcile_counters(db: AsyncSession, project_ids):
+    """依 tasks 重新計算指定專案的計數，在呼叫端的交易中執行，回傳計數有變動的專案 id。
+
+    計數有變動的專案會遞增看板版本，快取的看板片段與 ETag 才會反映校正後的數字。
+    """
+    # utils.board 匯入本模組，於此處匯入避免循環
+    from utils.board import bump_board_version
+
+    project_ids = sorted(set(project_ids))
+    if not project_ids:
+        return set()
+    await db.execute(select(Project.id).where(Project.id.in_(project_ids)).order_by(Project.id).with_for_update())
+    counter_columns = (BoardCounter.project_id, BoardCounter.dimension, BoardCounter.key, BoardCounter.count)
+    removed = await db.execute(delete(BoardCounter).where(BoardCounter.project_id.in_(project_ids)).returning(*counter_columns), execution_options={"synchronize_session": False})
+    before = _counts_by_project(removed.all())
+    columns = {
+        "lane": cast(Task.lane_id, String),
+        "user": func.coalesce(cast(Task.user_id, String), ""),
+        "status": func.coalesce(Task.status, ""),
+    }
+    for dimension, column in columns.items():
+        counts = (
+            select(Lane.project_id, literal(dimension), column, func.count())
+            .select_from(Task).join(Lane, Lane.id == Task.lane_id)
+            .where(Lane.project_id.in_(project_ids))
+            .group_by(Lane.project_id, column)
+        )
+        await db.execute(insert(BoardCounter).from_select(["project_id", "dimension", "key", "count"], counts))
+    after = _counts_by_project((await db.execute(select(*counter_columns).where(BoardCounter.project_id.in_(project_ids)))).all())
+    changed = {project_id for project_id in project_ids if before.get(project_id) != after.get(project_id)}
+    await bump_board_version(db, *changed)
+    return changed
+
+async def project_summary(db: AsyncSession, user_id: int, project_id: int):
+    """回傳使用者參與專案的計數摘要，不是成員時回傳 None。
+
+    計數與成員資格以同一個查詢取得，都走主鍵索引。
+    """
+    rows = (await db.execute(
+        select(BoardCounter.dimension, BoardCounter.key, BoardCounter.count)
+        .join(UserProject, UserProject.project_id == BoardCounter.project_id)
+        .where(UserProject.user_id == user_id, BoardCounter.project_id == project_id, BoardCounter.count != 0)
+    )).all()
+    # 沒有任何計數時，才需要另外確認是否為成員
+    if not rows and not await db.scalar(select(UserProject.project_id).where(UserProject.user_id == user_id, UserProject.project_id == project_id)):
+        return None
+    summary = {"project_id": project_id, "total": 0, "lanes": {}, "users": {}, "statuses": {}}
+    groups = {"lane": "lanes", "user": "users", "status": "statuses"}
+    for dimension, key, count in rows:
+        summary[groups[dimension]][key] = count
+        if dimension == "lane":
+            summary["total"] += count
+    return summary
+
+async def lane_counts(db: AsyncSession, project_id: int):
+    """專案各泳道的任務數，{泳道 id: 任務數}；沒有任務的泳道不在結果中。"""
+    rows = await db.execute(select(BoardCounter.key, BoardCounter.count).where(BoardCounter.project_id == project_id, BoardCounter.dimension == "lane"))
+    return {int(key): count for key, count in rows.all()}
+
+async def lane_task_count(db: AsyncSession, lane):
+    """單一泳道的任務數；不屬於專案的泳道沒有計數，回傳 None。"""
+    if not lane.project_id:
+        return None
+    count = await db.scalar(select(BoardCounter.count).where(BoardCounter.project_id == lane.project_id, BoardCounter.dimension == "lane", BoardCounter.key == str(lane.id)))
+    return count or 0
+
+async def reconcile_all(batch_size: int = RECONCILE_BATCH_SIZE):
+    """逐批校正所有專案，每批一個交易，避免長時間鎖住大量專案。"""
+    from database.db import SessionLocal
+
+    last_id, projects, corrected = 0, 0, 0
+    while True:
+        async with SessionLocal() as db:
+            project_ids = (await db.scalars(select(Project.id).where(Project.id > last_id).order_by(Project.id).limit(batch_size))).all()
+            if not project_ids:
+                break
+            corrected += len(await reconcile_counters(db, project_ids))
+            await db.commit()
+        last_id = project_ids[-1]
+        projects += len(project_ids)
+    logger.info("看板計數校正完成", extra={"fields": {"projects": projects, "corrected": corrected}})
+
+async def main(interval: float):
+    from database.db import engine
+
+    try:
+        while True:
+            await reconcile_all()
+            if not interval:
+                break
+            await asyncio.sleep(interval)
+    finally:
+        await engine.dispose()
+
+if __name__ == "__main__":
+    from utils.log import setup_logging
+
+    parser = argparse.ArgumentParser(description="校正看板計數")
+    parser.add_argument("--interval", type=float, default=0, help="每隔幾秒重複校正，0 表示只執行一次")
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(main(args.interval))
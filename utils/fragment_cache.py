@@ -0,0 +1,82 @@
+from collections import OrderedDict
+import os
+import threading
+
+class FragmentCache:
+    """已渲染 HTML 片段（str）或壓縮後本體（bytes）的 LRU 快取，同時限制筆數與總位元組數。
+
+    鍵中帶有看板版本，版本遞增後舊的項目不會再被讀到；
+    以 group 存入時，同一群組較舊的項目會立即移除。
+    """
+
+    def __init__(self, max_entries: int = 2048, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._groups = {}
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key, value, group=None):
+        size = len(value) if isinstance(value, bytes) else len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if group is not None:
+                previous = self._groups.get(group)
+                if previous is not None and previous != key:
+                    self._remove(previous)
+                self._groups[group] = key
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = (value, size, group)
+            self.bytes += size
+            while len(self._items) > self.max_entries or self.bytes > self.max_bytes:
+                oldest = next(iter(self._items))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        item = self._items.pop(key, None)
+        if item is None:
+            return
+        self.bytes -= item[1]
+        group = item[2]
+        if group is not None and self._groups.get(group) == key:
+            del self._groups[group]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._groups.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+fragment_cache = FragmentCache(
+    max_entries=int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "2048")),
+    max_bytes=int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+)
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+import asyncio
+import os
+import threading
+import time
+
+# bcrypt 成本，調整後使用者下次登入時會自動以新成本重新雜湊
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# 執行雜湊的執行緒數量與最多可排隊的工作數
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "2"))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))
+
+# 密碼加密設定，成本與設定不同的雜湊會被 verify_and_update 視為需要更新
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+class HashingBusyError(Exception):
+    """排隊中的雜湊工作已達上限。"""
+
+class HashingExecutor:
+    """在專用執行緒池中執行 bcrypt，避免阻塞事件迴圈並限制同時排隊的數量。"""
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.max_run = 0.0
+
+    async def run(self, func, *args):
+        with self._lock:
+            if self.pending >= self.queue_limit:
+                self.rejected += 1
+                raise HashingBusyError()
+            self.pending += 1
+        queued_at = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            result = func(*args)
+            return result, started - queued_at, time.perf_counter() - started
+
+        try:
+            result, wait, run = await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            with self._lock:
+                self.pending -= 1
+        with self._lock:
+            self.completed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_run += run
+            self.max_run = max(self.max_run, run)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rounds": BCRYPT_ROUNDS,
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "pending": self.pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / self.completed * 1000, 3) if self.completed else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "avg_run_ms": round(self.total_run / self.completed * 1000, 3) if self.completed else 0.0,
+                "max_run_ms": round(self.max_run * 1000, 3),
+            }
+
+hashing_executor = HashingExecutor(workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT)
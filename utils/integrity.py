@@ -0,0 +1,5 @@
+from sqlalchemy.exc import IntegrityError
+
+def is_unique_violation(error: IntegrityError, constraint: str):
+    """判斷 IntegrityError 是否來自指定的唯一約束（PostgreSQL 的錯誤訊息帶有約束名稱）。"""
+    return constraint in str(error.orig)
@@ -0,0 +1,106 @@
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from logging.handlers import QueueHandler, QueueListener
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+
+# 日誌最先設定，此時其他模組尚未載入 .env
+load_dotenv()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# 佇列滿時直接丟棄，請求不會因為輸出變慢而被阻塞
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# 一般請求日誌的取樣比例，慢請求與錯誤（WARNING 以上）一律保留
+LOG_REQUEST_SAMPLE_RATE = float(os.getenv("LOG_REQUEST_SAMPLE_RATE", "1.0"))
+
+# 目前請求的關聯 id，由 RequestIdMiddleware 設定
+request_id: ContextVar = ContextVar("request_id", default=None)
+
+class JsonFormatter(logging.Formatter):
+    """每筆紀錄輸出一行 JSON；以 extra={"fields": {...}} 傳入的欄位會併入同一層。"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class LogQueueHandler(QueueHandler):
+    """在呼叫端執行緒只做最少的工作：展開訊息、記下關聯 id，其餘交給背景執行緒。"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class SamplingFilter(logging.Filter):
+    """依比例保留低於 WARNING 的紀錄，用於大量的例行事件。"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+_handler = None
+_listener = None
+
+def setup_logging():
+    """設定根 logger 經由佇列寫到 stdout，重複呼叫不會重複安裝。"""
+    global _handler, _listener
+    if _handler is not None:
+        return
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _handler = LogQueueHandler(log_queue)
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(_handler)
+    logging.getLogger("request").addFilter(SamplingFilter(LOG_REQUEST_SAMPLE_RATE))
+    _listener.start()
+    # 結束時送出佇列中剩餘的紀錄
+    atexit.register(_listener.stop)
+
+def log_stats():
+    if _handler is None:
+        return {"enabled": False}
+    return {
+        "enabled": True,
+        "queued": _handler.queue.qsize(),
+        "max_queue": LOG_QUEUE_SIZE,
+        "dropped": _handler.dropped,
+        "request_sample_rate": LOG_REQUEST_SAMPLE_RATE,
+    }
@@ -0,0 +1,49 @@
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+import base64
+import json
+import os
+
+# 每頁預設筆數與上限，上限避免單一請求取回過多資料
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+def page_size(limit: int = None):
+    return max(1, min(limit or PAGE_SIZE, MAX_PAGE_SIZE))
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, size: int):
+    """解析游標，格式不符時回傳 400。"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="無效的分頁游標。")
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(value, (int, float, str)) for value in values):
+        raise HTTPException(status_code=400, detail="無效的分頁游標。")
+    return values
+
+async def keyset_page(db: AsyncSession, stmt, key_columns, cursor: str = None, limit: int = None):
+    """依 key_columns 遞增排序取一頁，回傳 (項目, 下一頁游標)。
+
+    key_columns 需為非空值且組合後唯一（通常以 id 結尾），排序才會穩定。
+    以 WHERE (key) > (上一頁最後一筆) 取代 OFFSET，並多取一筆判斷是否還有下一頁，
+    不需要 COUNT，任何頁數的成本都相同。
+    """
+    limit = page_size(limit)
+    if cursor:
+        values = decode_cursor(cursor, len(key_columns))
+        if len(key_columns) == 1:
+            stmt = stmt.where(key_columns[0] > values[0])
+        else:
+            stmt = stmt.where(tuple_(*key_columns) > tuple_(*values))
+    items = (await db.scalars(stmt.order_by(*key_columns).limit(limit + 1))).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(getattr(items[-1], column.key) for column in key_columns)
+    return items, next_cursor
@@ -0,0 +1,119 @@
+from fastapi import BackgroundTasks
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.db import SessionLocal
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 排序值之間的間距，移動時取前後兩筆的中間值，只需更新被移動的那一筆
+POSITION_GAP = 1024
+# 插入後剩餘間距小於此值時，於背景重新平衡整個群組
+REBALANCE_THRESHOLD = 8
+
+async def next_position(db: AsyncSession, model, scope_column, scope_value):
+    """取得群組尾端的新排序值。"""
+    stmt = select(func.max(model.position))
+    if scope_value is not None:
+        stmt = stmt.where(scope_column == scope_value)
+    max_position = await db.scalar(stmt) or 0
+    return max_position + POSITION_GAP
+
+async def neighbor_positions(db: AsyncSession, model, scope_column, scope_value, new_index: int, exclude_id: int):
+    """取得移動到 new_index（從 1 開始）後前後兩筆的排序值，不存在時為 None。
+
+    若鄰居尚未有排序值（舊資料），回傳 None 表示需要先重新平衡。
+    """
+    new_index = max(new_index, 1)
+    stmt = select(model.position).where(scope_column == scope_value, model.id != exclude_id)
+    rows = (await db.execute(stmt.order_by(model.position.asc().nulls_last(), model.id).offset(max(new_index - 2, 0)).limit(1 if new_index == 1 else 2))).all()
+    if not rows and new_index > 1:
+        # 索引超出範圍時放到最後一筆之後
+        rows = (await db.execute(stmt.order_by(model.position.desc().nulls_first(), model.id.desc()).limit(1))).all()
+    if any(row[0] is None for row in rows):
+        return None
+    if new_index == 1:
+        return None, rows[0][0] if rows else None
+    before = rows[0][0] if rows else None
+    after = rows[1][0] if len(rows) > 1 else None
+    return before, after
+
+def position_between(before, after):
+    """計算介於 before 與 after 之間的排序值，間距用盡時回傳 None。"""
+    if before is None and after is None:
+        return POSITION_GAP
+    if before is None:
+        return after - POSITION_GAP
+    if after is None:
+        return before + POSITION_GAP
+    if after - before < 2:
+        return None
+    return before + (after - before) // 2
+
+def positions_between(before, after, count: int):
+    """計算 count 個介於 before 與 after 之間、等距遞增的排序值，間距用盡時回傳 None。
+
+    count 為 1 時與 position_between 的結果相同。
+    """
+    if before is None and after is None:
+        return [n * POSITION_GAP for n in range(1, count + 1)]
+    if before is None:
+        return [after - (count + 1 - n) * POSITION_GAP for n in range(1, count + 1)]
+    if after is None:
+        return [before + n * POSITION_GAP for n in range(1, count + 1)]
+    if after - before < count + 1:
+        return None
+    return [before + (after - before) * n // (count + 1) for n in range(1, count + 1)]
+
+def needs_rebalance(before, position, after):
+    """新排序值與任一鄰居的距離過小時回傳 True。"""
+    if before is not None and position - before < REBALANCE_THRESHOLD:
+        return True
+    if after is not None and after - position < REBALANCE_THRESHOLD:
+        return True
+    return False
+
+async def rebalance(db: AsyncSession, model, scope_column, scope_value):
+    """以單一 UPDATE 依目前順序將群組重新編號為等間距排序值。"""
+    ranked = (
+        select(model.id, func.row_number().over(order_by=(model.position.asc().nulls_last(), model.id)).label("rank"))
+        .where(scope_column == scope_value)
+        .subquery()
+    )
+    stmt = update(model).where(model.id == ranked.c.id).values(position=ranked.c.rank * POSITION_GAP)
+    await db.execute(stmt, execution_options={"synchronize_session": False})
+
+async def rebalance_all(db: AsyncSession, model, scope_column):
+    """以單一 UPDATE 重新平衡所有群組，保留各群組目前的順序並補上缺少的排序值。"""
+    ranked = (
+        select(model.id, func.row_number().over(partition_by=scope_column, order_by=(model.position.asc().nulls_last(), model.id)).label("rank"))
+        .subquery()
+    )
+    stmt = update(model).where(model.id == ranked.c.id).values(position=ranked.c.rank * POSITION_GAP)
+    await db.execute(stmt, execution_options={"synchronize_session": False})
+
+async def rebalance_in_background(model, scope_column, scope_value):
+    """背景工作使用的重新平衡，自行開啟並提交 Session。"""
+    async with SessionLocal() as db:
+        try:
+            await rebalance(db, model, scope_column, scope_value)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            logger.exception("重新平衡排序值時出錯")
+
+async def move_to_index(db: AsyncSession, obj, scope_column, scope_value, new_index: int, background_tasks: BackgroundTasks):
+    """將 obj 移到群組內的 new_index，一般情況下只寫入 obj 本身。"""
+    model = type(obj)
+    neighbors = await neighbor_positions(db, model, scope_column, scope_value, new_index, obj.id)
+    position = position_between(*neighbors) if neighbors else None
+    if position is None:
+        # 間距已用盡或仍有未排序的舊資料，先同步重新平衡後再計算一次
+        await rebalance(db, model, scope_column, scope_value)
+        neighbors = await neighbor_positions(db, model, scope_column, scope_value, new_index, obj.id)
+        position = position_between(*neighbors)
+    elif needs_rebalance(neighbors[0], position, neighbors[1]):
+        background_tasks.add_task(rebalance_in_background, model, scope_column, scope_value)
+    obj.position = position
+    db.add(obj)
+    return position
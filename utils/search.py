@@ -0,0 +1,41 @@
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.project import Project
+from models.lane import Lane
+from models.task import Task
+from models.user_project import UserProject
+from utils.pagination import decode_cursor, encode_cursor, page_size
+
+# 與 migration 中產生 search_vector 的設定相同
+SEARCH_CONFIG = "simple"
+
+def escape_like(value: str):
+    return value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+async def search_tasks(db: AsyncSession, user_id: int, q: str, cursor: str = None, limit: int = None):
+    """在使用者所屬專案中搜尋任務，依相關度排序，回傳 (結果, 下一頁游標)。
+
+    三個條件皆可使用索引：全文檢索走 search_vector 的 GIN 索引，
+    相似度（%）與子字串（ILIKE）走 name 的 trigram GIN 索引。
+    分數為 ts_rank 加上 trigram 相似度，以 (分數遞減, id) 作為分頁鍵。
+    """
+    limit = page_size(limit)
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    score = func.ts_rank(Task.search_vector, tsquery) + func.similarity(Task.name, q)
+    stmt = (
+        select(Task.id, Task.name, Lane.id.label("lane_id"), Lane.name.label("lane_name"), Project.id.label("project_id"), Project.name.label("project_name"), score.label("score"))
+        .select_from(Task)
+        .join(Task.lane)
+        .join(Lane.project)
+        .join(UserProject, and_(UserProject.project_id == Project.id, UserProject.user_id == user_id))
+        .where(or_(Task.search_vector.op("@@")(tsquery), Task.name.op("%")(q), Task.name.ilike(f"%{escape_like(q)}%", escape="!")))
+    )
+    if cursor:
+        last_score, last_id = decode_cursor(cursor, 2)
+        stmt = stmt.where(or_(score < last_score, and_(score == last_score, Task.id > last_id)))
+    rows = (await db.execute(stmt.order_by(score.desc(), Task.id).limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1].score, rows[-1].id])
+    return rows, next_cursor
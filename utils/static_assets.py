@@ -0,0 +1,122 @@
+from starlette.datastructures import Headers
+from starlette.responses import PlainTextResponse, Response
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 帶雜湊的網址內容永不改變，可讓瀏覽器與 CDN 快取一年且不再驗證
+IMMUTABLE = "public, max-age=31536000, immutable"
+# 未帶雜湊的舊網址仍可使用，但每次都需以 ETag 驗證
+REVALIDATE = "no-cache"
+
+class StaticAsset:
+    __slots__ = ("content_type", "digest", "variants")
+
+    def __init__(self, content_type: str, digest: str, variants: dict):
+        self.content_type = content_type
+        self.digest = digest
+        self.variants = variants
+
+    def etag(self, encoding: str):
+        """各編碼的位元組不同，強式 ETag 也需不同，快取才不會以 304 回應錯誤的編碼。"""
+        return f'"{self.digest}"' if encoding == "identity" else f'"{self.digest}-{encoding}"'
+
+def accepted_encodings(accept_encoding: str):
+    """解析 Accept-Encoding，回傳 q 值大於 0 的編碼。"""
+    encodings = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+class StaticAssets:
+    """啟動時為 static/ 下的檔案計算內容雜湊並預先壓縮（gzip，安裝 brotli 時另有 br）。
+
+    以 ASGI 應用程式掛載於 /static，依 Accept-Encoding 回傳預先壓縮的版本；
+    模板以 static_url() 取得帶雜湊的網址，檔案內容改變時網址跟著改變。
+    """
+
+    def __init__(self, directory: str, prefix: str = "/static"):
+        self.directory = directory
+        self.prefix = prefix
+        self.urls = {}
+        self.assets = {}
+
+    def build(self):
+        started = time.perf_counter()
+        urls, assets = {}, {}
+        for root, _, files in os.walk(self.directory):
+            for filename in sorted(files):
+                full_path = os.path.join(root, filename)
+                path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    content = f.read()
+                digest = hashlib.sha256(content).hexdigest()[:12]
+                stem, ext = os.path.splitext(path)
+                hashed = f"{stem}.{digest}{ext}"
+                content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+                if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+                    content_type += "; charset=utf-8"
+                variants = {"identity": content}
+                # 壓縮後沒有變小（例如圖片）就只保留原始內容
+                compressed = gzip.compress(content, compresslevel=9, mtime=0)
+                if len(compressed) < len(content):
+                    variants["gzip"] = compressed
+                if brotli is not None:
+                    compressed = brotli.compress(content, quality=11)
+                    if len(compressed) < len(content):
+                        variants["br"] = compressed
+                asset = StaticAsset(content_type, digest, variants)
+                urls[path] = f"{self.prefix}/{hashed}"
+                assets[hashed] = (asset, IMMUTABLE)
+                assets[path] = (asset, REVALIDATE)
+        self.urls, self.assets = urls, assets
+        logger.info("靜態檔案建置完成", extra={"fields": {"files": len(urls), "brotli": brotli is not None, "ms": round((time.perf_counter() - started) * 1000, 2)}})
+
+    def url(self, path: str):
+        """模板使用的網址；未知的檔案回傳原始路徑。"""
+        return self.urls.get(path.lstrip("/"), f"{self.prefix}/{path.lstrip('/')}")
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] not in ("GET", "HEAD"):
+            return await PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})(scope, receive, send)
+        # 掛載後 root_path 含 /static，去掉後即為相對路徑
+        path = scope["path"][len(scope.get("root_path", "")):].lstrip("/")
+        entry = self.assets.get(path)
+        if entry is None:
+            return await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+        asset, cache_control = entry
+        request_headers = Headers(scope=scope)
+        accepted = accepted_encodings(request_headers.get("accept-encoding", ""))
+        encoding = next((name for name in ("br", "gzip") if name in accepted and name in asset.variants), "identity")
+        etag = asset.etag(encoding)
+        headers = {"Cache-Control": cache_control, "ETag": etag, "Vary": "Accept-Encoding"}
+        # 只和這次選出的編碼比對
+        if etag in [tag.strip() for tag in request_headers.get("if-none-match", "").split(",")]:
+            return await Response(status_code=304, headers=headers)(scope, receive, send)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        body = asset.variants[encoding]
+        if scope["method"] == "HEAD":
+            headers["Content-Length"] = str(len(body))
+            body = b""
+        await Response(content=body, headers=headers, media_type=asset.content_type)(scope, receive, send)
+
+static_assets = StaticAssets("static")
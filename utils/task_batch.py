@@ -0,0 +1,133 @@
+from collections import Counter
+from fastapi import HTTPException
+from sqlalchemy import Integer, case, column, delete, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.lane import Lane
+from models.task import Task
+from models.user import User
+from utils.counters import task_deltas
+from utils.position import POSITION_GAP, needs_rebalance, positions_between
+
+def lane_positions(order, moved, old_positions):
+    """計算泳道內被移動任務的新排序值，其餘任務沿用原值。
+
+    連續排在一起的被移動任務平分前後兩個既有排序值之間的間距；
+    間距不足或過小（needs_rebalance）時回傳 None，由呼叫端將整個泳道重新編號。
+    """
+    positions = {}
+    index = 0
+    while index < len(order):
+        if order[index] not in moved:
+            index += 1
+            continue
+        end = index
+        while end < len(order) and order[end] in moved:
+            end += 1
+        before = old_positions[order[index - 1]][1] if index else None
+        after = old_positions[order[end]][1] if end < len(order) else None
+        run = positions_between(before, after, end - index)
+        if run is None:
+            return None
+        bounds = [before, *run, after]
+        if any(needs_rebalance(bounds[offset], position, bounds[offset + 2]) for offset, position in enumerate(run)):
+            return None
+        positions.update(zip(order[index:end], run))
+        index = end
+    return positions
+
+async def apply_task_batch(db: AsyncSession, operations):
+    """在呼叫端的交易中依序套用批次操作，回傳 (受影響的專案 id, 差異, 計數增減)。
+
+    操作先在記憶體中依序計算，最後每種變更只送出一個語句：
+    刪除以 IN、改名與指派以 CASE、移動以 UPDATE ... FROM (VALUES ...)。
+    只有被移動的任務取得新排序值；泳道的間距用盡時才將該泳道重新編號。
+    """
+    task_ids = {operation.task_id for operation in operations}
+    rows = (await db.execute(select(Task.id, Task.lane_id, Task.name, Task.user_id, Task.status).where(Task.id.in_(task_ids)))).all()
+    tasks = {row.id: {"id": row.id, "lane_id": row.lane_id, "name": row.name, "user_id": row.user_id} for row in rows}
+    # 操作前的泳道、指派與狀態，用來計算看板計數的增減
+    originals = {row.id: (row.lane_id, row.user_id, row.status) for row in rows}
+    missing = task_ids - tasks.keys()
+    if missing:
+        raise HTTPException(status_code=404, detail=f"查無任務：{', '.join(str(task_id) for task_id in sorted(missing))}。")
+
+    target_lane_ids = {operation.lane_id for operation in operations if operation.op == "move" and operation.lane_id}
+    lane_ids = target_lane_ids | {task["lane_id"] for task in tasks.values() if task["lane_id"]}
+    lane_projects = dict((await db.execute(select(Lane.id, Lane.project_id).where(Lane.id.in_(lane_ids)))).all()) if lane_ids else {}
+    if target_lane_ids - lane_projects.keys():
+        raise HTTPException(status_code=404, detail="目標泳道不存在。")
+    user_ids = {operation.user_id for operation in operations if operation.op == "reassign" and operation.user_id}
+    if user_ids and len((await db.scalars(select(User.id).where(User.id.in_(user_ids)))).all()) != len(user_ids):
+        raise HTTPException(status_code=404, detail="查無使用者。")
+
+    deleted, renamed, reassigned, moves = set(), {}, {}, []
+    for operation in operations:
+        task = tasks[operation.task_id]
+        if task["id"] in deleted:
+            raise HTTPException(status_code=400, detail=f"任務 {task['id']} 已在同一批次中刪除。")
+        if operation.op == "delete":
+            deleted.add(task["id"])
+        elif operation.op == "rename":
+            if not operation.name or not operation.name.strip():
+                raise HTTPException(status_code=400, detail="改名操作需要提供名稱。")
+            task["name"] = renamed[task["id"]] = operation.name.strip()
+        elif operation.op == "reassign":
+            task["user_id"] = reassigned[task["id"]] = operation.user_id
+        else:
+            target = operation.lane_id or task["lane_id"]
+            if target is None:
+                raise HTTPException(status_code=400, detail="移動操作需要提供目標泳道。")
+            moves.append((task, target, operation.index))
+
+    # 載入有任務移入的泳道目前的順序，於記憶體中依序套用移動
+    orders, old_positions = {}, {}
+    move_lanes = {target for _, target, _ in moves}
+    if move_lanes:
+        orders = {lane_id: [] for lane_id in move_lanes}
+        stmt = select(Task.id, Task.lane_id, Task.position).where(Task.lane_id.in_(move_lanes)).order_by(Task.lane_id, Task.position.asc().nulls_last(), Task.id)
+        for task_id, lane_id, position in (await db.execute(stmt)).all():
+            orders[lane_id].append(task_id)
+            old_positions[task_id] = (lane_id, position)
+    for task, target, index in moves:
+        if task["lane_id"] in orders and task["id"] in orders[task["lane_id"]]:
+            orders[task["lane_id"]].remove(task["id"])
+        order = orders[target]
+        order.insert(len(order) if index is None else min(index - 1, len(order)), task["id"])
+        task["lane_id"] = target
+    moved_ids = {task["id"] for task, _, _ in moves}
+    positions = []
+    for lane_id, order in orders.items():
+        order[:] = [task_id for task_id in order if task_id not in deleted]
+        placed = lane_positions(order, moved_ids, old_positions)
+        if placed is None:
+            placed = {task_id: number * POSITION_GAP for number, task_id in enumerate(order, start=1)}
+        for task_id, position in placed.items():
+            if old_positions.get(task_id) != (lane_id, position):
+                positions.append((task_id, lane_id, position))
+
+    sync = {"synchronize_session": False}
+    if deleted:
+        await db.execute(delete(Task).where(Task.id.in_(deleted)), execution_options=sync)
+    if renamed:
+        await db.execute(update(Task).where(Task.id.in_(renamed)).values(name=case(renamed, value=Task.id, else_=Task.name)), execution_options=sync)
+    if reassigned:
+        await db.execute(update(Task).where(Task.id.in_(reassigned)).values(user_id=case(reassigned, value=Task.id, else_=Task.user_id)), execution_options=sync)
+    if positions:
+        moved = values(column("id", Integer), column("lane_id", Integer), column("position", Integer), name="moved").data(positions)
+        await db.execute(update(Task).where(Task.id == moved.c.id).values(lane_id=moved.c.lane_id, position=moved.c.position), execution_options=sync)
+
+    project_ids = {lane_projects.get(lane_id) for lane_id in lane_ids} - {None}
+    deltas = Counter()
+    for task_id, (lane_id, user_id, status) in originals.items():
+        task = tasks[task_id]
+        if task_id not in deleted and (task["lane_id"], task["user_id"]) == (lane_id, user_id):
+            continue
+        task_deltas(deltas, lane_projects.get(lane_id), lane_id, user_id, status, -1)
+        if task_id not in deleted:
+            task_deltas(deltas, lane_projects.get(task["lane_id"]), task["lane_id"], task["user_id"], status, 1)
+    diff = {
+        "deleted": sorted(deleted),
+        "tasks": [task for task in tasks.values() if task["id"] not in deleted],
+        "lanes": {lane_id: order for lane_id, order in orders.items()},
+    }
+    return project_ids, diff, deltas
@@ -0,0 +1,45 @@
+from fastapi.responses import HTMLResponse
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 不依賴使用者或資料的頁面，內容只跟路徑有關，啟動時渲染一次後重複使用
+STATIC_PAGES = {
+    "auth/login.html": "/users/login",
+    "auth/register.html": "/users/register",
+}
+
+static_pages = {}
+
+def build_environment(directory: str, auto_reload: bool, cache_dir: str = None):
+    """建立 Jinja 環境：編譯結果寫入檔案系統的位元組碼快取，重啟後不必重新解析模板。"""
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    bytecode_cache = FileSystemBytecodeCache(cache_dir) if cache_dir else FileSystemBytecodeCache()
+    # cache_size=-1 讓編譯好的模板常駐記憶體，不會被 LRU 淘汰後重新載入
+    return Environment(loader=FileSystemLoader(directory), autoescape=True, auto_reload=auto_reload, bytecode_cache=bytecode_cache, cache_size=-1)
+
+def compile_templates(templates):
+    """啟動時預先載入全部模板，避免每個 worker 在第一次請求時才編譯。"""
+    started = time.perf_counter()
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.env.get_template(name)
+    logger.info("模板預先編譯完成", extra={"fields": {"templates": len(names), "ms": round((time.perf_counter() - started) * 1000, 2)}})
+
+def prerender_static_pages(templates):
+    """預先渲染 STATIC_PAGES；開啟自動重新載入時不快取，修改模板後立即生效。"""
+    if templates.env.auto_reload:
+        return
+    for name, path in STATIC_PAGES.items():
+        # 模板只讀取 request.path，以對應的路徑代替實際的 Request
+        static_pages[name] = templates.get_template(name).render({"request": {"path": path}}).encode("utf-8")
+
+def static_page_response(templates, name: str, request):
+    body = static_pages.get(name)
+    if body is None:
+        return templates.TemplateResponse(name, {"request": request})
+    return HTMLResponse(content=body)
@@ -0,0 +1,99 @@
+from contextvars import ContextVar
+from jinja2 import Template
+from sqlalchemy import event
+import os
+import time
+
+# 超過門檻（毫秒）的請求會在日誌中附上執行過的 SQL
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+# 是否在回應加上 Server-Timing 標頭，正式環境可關閉以免洩漏內部耗時
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+
+class RequestTiming:
+    """單一請求累計的 SQL 與模板渲染耗時。"""
+
+    __slots__ = ("started", "db_time", "queries", "render_time", "renders", "statements", "_render_depth")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.render_time = 0.0
+        self.renders = 0
+        self.statements = []
+        self._render_depth = 0
+
+    def add_query(self, statement: str, elapsed: float):
+        self.db_time += elapsed
+        self.queries += 1
+        if len(self.statements) < SLOW_REQUEST_MAX_STATEMENTS:
+            self.statements.append((statement, elapsed))
+
+    def snapshot(self):
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "db_ms": round(self.db_time * 1000, 2),
+            "queries": self.queries,
+            "render_ms": round(self.render_time * 1000, 2),
+            "renders": self.renders,
+        }
+
+# 目前請求的計時物件；請求之外（啟動、背景工作）為 None，不會被記錄
+current_timing: ContextVar = ContextVar("current_timing", default=None)
+
+# 開始時間記在每個語句的執行環境上，語句失敗（例如違反唯一約束）時不會殘留在連線中
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._query_started = time.perf_counter()
+
+def _record_query(context, statement):
+    started = getattr(context, "_query_started", None)
+    timing = current_timing.get()
+    if started is not None and timing is not None:
+        timing.add_query(statement, time.perf_counter() - started)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_query(context, statement)
+
+def _handle_error(exception_context):
+    # 失敗的語句同樣佔用資料庫時間，一併計入
+    _record_query(exception_context.execution_context, exception_context.statement)
+
+def instrument_engine(engine):
+    """在引擎上掛載 SQL 計時；async 引擎的 greenlet 會沿用請求的 contextvars。"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(sync_engine, "handle_error", _handle_error)
+
+class TimedTemplate(Template):
+    """記錄渲染耗時的模板；巢狀呼叫 render 時只計算最外層。"""
+
+    def render(self, *args, **kwargs):
+        timing = current_timing.get()
+        if timing is None:
+            return super().render(*args, **kwargs)
+        timing._render_depth += 1
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            timing._render_depth -= 1
+            if timing._render_depth == 0:
+                timing.render_time += time.perf_counter() - started
+                timing.renders += 1
+
+def instrument_templates(templates):
+    """讓 Jinja2Templates 之後載入的模板都使用 TimedTemplate。"""
+    templates.env.template_class = TimedTemplate
+    if templates.env.cache is not None:
+        templates.env.cache.clear()
+
+def server_timing_header(snapshot: dict):
+    return (
+        f'db;dur={snapshot["db_ms"]};desc="{snapshot["queries"]} queries", '
+        f'tpl;dur={snapshot["render_ms"]}, '
+        f'total;dur={snapshot["total_ms"]}'
+    )
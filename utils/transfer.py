@@ -0,0 +1,159 @@
+from anyio import to_thread
+from datetime import datetime
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.db import SessionLocal
+from models.lane import Lane
+from models.task import Task
+from utils.position import POSITION_GAP, next_position
+import csv
+import io
+import itertools
+import json
+import os
+
+# 匯出時每次從伺服器端游標取回的筆數，以及匯入時每個多筆 INSERT 的筆數
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+
+FIELDS = ["type", "lane", "name", "priority", "status", "end_date"]
+
+class ImportFormatError(ValueError):
+    pass
+
+async def export_records(project_id: int):
+    """依看板順序逐批產生泳道與任務記錄。
+
+    使用 yield_per 的伺服器端游標讀取，記憶體用量與專案大小無關。
+    串流會在回應送出期間持續進行，因此自行開啟 Session，不使用請求的 Session。
+    """
+    async with SessionLocal() as db:
+        lanes = await db.stream(select(Lane.name).where(Lane.project_id == project_id).order_by(Lane.position, Lane.id).execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in lanes.partitions():
+            yield [{"type": "lane", "lane": name, "name": None, "priority": None, "status": None, "end_date": None} for (name,) in rows]
+        stmt = (
+            select(Lane.name, Task.name, Task.priority, Task.status, Task.end_date)
+            .select_from(Task)
+            .join(Task.lane)
+            .where(Lane.project_id == project_id)
+            .order_by(Lane.position, Lane.id, Task.position, Task.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        tasks = await db.stream(stmt)
+        async for rows in tasks.partitions():
+            yield [
+                {"type": "task", "lane": lane_name, "name": name, "priority": priority, "status": status, "end_date": end_date.isoformat() if end_date else None}
+                for lane_name, name, priority, status, end_date in rows
+            ]
+
+async def export_ndjson(project_id: int):
+    async for records in export_records(project_id):
+        yield "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
+async def export_csv(project_id: int):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, FIELDS)
+    writer.writeheader()
+    async for records in export_records(project_id):
+        writer.writerows(records)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def read_records(file, fmt: str):
+    """從頭逐行解析上傳的 NDJSON 或 CSV 檔案，不會一次讀入整個檔案。
+
+    結束時分離文字包裝而不關閉 file，呼叫端可再讀一次。
+    """
+    file.seek(0)
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            yield from csv.DictReader(text)
+            return
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                raise ImportFormatError(f"第 {line_number} 行不是有效的 JSON。")
+    finally:
+        text.detach()
+
+async def record_batches(file, fmt: str):
+    """每次在執行緒中讀取並解析 IMPORT_BATCH_SIZE 筆記錄，讀取磁碟上的暫存檔時不阻塞事件迴圈。"""
+    records = read_records(file, fmt)
+    try:
+        while batch := await to_thread.run_sync(list, itertools.islice(records, IMPORT_BATCH_SIZE)):
+            yield batch
+    finally:
+        records.close()
+
+def parse_end_date(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ImportFormatError(f"無效的日期：{value}")
+
+async def import_records(db: AsyncSession, project_id: int, file, fmt: str):
+    """將上傳的檔案寫入專案，回傳新增的泳道數、任務數與略過的重複任務數。
+
+    在呼叫端的交易中執行，由呼叫端提交。檔案讀兩次：第一次檢查格式並收集新泳道，
+    以單一 INSERT ... RETURNING 寫入；第二次以多筆 INSERT 批次寫入任務，記憶體用量與檔案大小無關。
+    同一泳道已有同名任務時略過（ON CONFLICT DO NOTHING），排序值依檔案順序接在既有任務之後。
+    """
+    lane_ids = {name: lane_id for lane_id, name in (await db.execute(select(Lane.id, Lane.name).where(Lane.project_id == project_id))).all()}
+    lane_position = await next_position(db, Lane, Lane.project_id, project_id)
+    task_positions = dict((await db.execute(select(Task.lane_id, func.max(Task.position)).join(Task.lane).where(Lane.project_id == project_id).group_by(Task.lane_id))).all())
+    counts = {"lanes": 0, "tasks": 0, "skipped": 0}
+
+    new_lanes = {}
+    index = 0
+    async for records in record_batches(file, fmt):
+        for record in records:
+            index += 1
+            if not isinstance(record, dict):
+                raise ImportFormatError(f"第 {index} 筆記錄格式錯誤。")
+            lane_name = (record.get("lane") or "").strip()
+            if not lane_name:
+                raise ImportFormatError(f"第 {index} 筆記錄缺少泳道名稱。")
+            if record.get("type", "task") != "lane":
+                if not (record.get("name") or "").strip():
+                    raise ImportFormatError(f"第 {index} 筆記錄缺少任務名稱。")
+                parse_end_date(record.get("end_date"))
+            if lane_name not in lane_ids and lane_name not in new_lanes:
+                new_lanes[lane_name] = lane_position + len(new_lanes) * POSITION_GAP
+    if new_lanes:
+        rows = [{"name": name, "project_id": project_id, "position": position} for name, position in new_lanes.items()]
+        result = await db.execute(insert(Lane).returning(Lane.id, Lane.name), rows)
+        lane_ids.update({name: lane_id for lane_id, name in result.all()})
+        counts["lanes"] = len(rows)
+
+    stmt = pg_insert(Task.__table__).on_conflict_do_nothing(index_elements=["lane_id", "name"]).returning(Task.__table__.c.id)
+    async for records in record_batches(file, fmt):
+        batch = []
+        for record in records:
+            if record.get("type", "task") == "lane":
+                continue
+            lane_id = lane_ids[record["lane"].strip()]
+            position = (task_positions.get(lane_id) or 0) + POSITION_GAP
+            task_positions[lane_id] = position
+            batch.append({
+                "name": record["name"].strip(),
+                "lane_id": lane_id,
+                "position": position,
+                "priority": record.get("priority") or None,
+                "status": record.get("status") or None,
+                "end_date": parse_end_date(record.get("end_date")),
+            })
+        if batch:
+            inserted = len((await db.execute(stmt, batch)).all())
+            counts["tasks"] += inserted
+            counts["skipped"] += len(batch) - inserted
+    return counts
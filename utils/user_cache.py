@@ -0,0 +1,66 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+import os
+import threading
+import time
+
+@dataclass(frozen=True)
+class CachedUser:
+    """快取中的使用者資料，只保留驗證與頁面顯示需要的欄位。"""
+    id: int
+    name: str
+    email: str
+    is_active: bool
+
+class UserCache:
+    """有上限與存活時間的使用者快取，以 token 中的使用者 id 為鍵。
+
+    快取只存在於單一 worker 行程內，其他行程的資料最晚在 ttl 秒後過期。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None or item[0] < now:
+                if item is not None:
+                    del self._items[user_id]
+                self.misses += 1
+                return None
+            self._items.move_to_end(user_id)
+            self.hits += 1
+            return item[1]
+
+    def set(self, user):
+        cached = CachedUser(id=user.id, name=user.name, email=user.email, is_active=bool(user.is_active))
+        with self._lock:
+            self._items[user.id] = (time.monotonic() + self.ttl, cached)
+            self._items.move_to_end(user.id)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return cached
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._items), "maxsize": self.maxsize, "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+user_cache = UserCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+)